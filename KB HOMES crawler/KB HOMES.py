@@ -0,0 +1,854 @@
+import requests
+from bs4 import BeautifulSoup
+import re
+import csv
+from datetime import datetime
+import time
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlparse, parse_qs
+from playwright.sync_api import sync_playwright
+import os
+import sys
+import traceback
+import argparse
+
+# 共享模块(content_wait 等)位于仓库根目录，即本目录的上一级；单独复制本目录运行时需一并带上这些模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from content_wait import wait_for_stable_count, playwright_counter
+from dom_extract import extract_cards, field
+from browser_cache import AssetCache, DEFAULT_CACHE_DIR
+from dead_letter import DeadLetterStore
+
+# 禁用SSL警告
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# 全局变量用于状态跟踪
+current_county = ""
+current_community = ""
+current_house = ""
+errors = []
+error_urls = []  # 存储出错的URL
+written_urls = set()  # 存储已写入的URL，用于检测重复
+total_homes_scraped = 0  # 跟踪总共爬取的房源数量
+
+# 浏览器静态资源缓存（未指定 --browser-cache 时为 None）
+browser_cache = None
+
+# 失败URL的持久化记录，运行结束时和 replay 命令只重试这些URL
+DEAD_LETTER_FILE = "kb_homes_dead_letters.sqlite"
+dead_letters = None
+
+# 数据文件；replay 命令把重试成功的房源追加到同一个文件
+CSV_FILENAME = 'kb_homes_0704.csv'
+
+# 进度打印
+last_print_time = 0
+print_interval = 60  # 每分钟打印一次进度
+
+# 县页面的社区卡片、社区页面和"See all"页面的房源卡片
+COUNTY_CARD_SELECTOR = "div.row.community-item, a.btn-primary.btn-explore"
+COMMUNITY_CARD_SELECTOR = "div#floorPlans div.card-item, div#mir div.card-item"
+SEE_ALL_CARD_SELECTOR = "div.mir-home-card-container"
+# 社区列表容器的备选选择器，按顺序尝试
+COMMUNITY_CONTAINER_SELECTORS = ["div.communities-filtered", "div.container.scroll-list.community-list.custom-scrollbar"]
+
+
+def create_session():
+    """创建带有重试机制的requests会话"""
+    session = requests.Session()
+    retry_strategy = Retry(
+        total=2,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"]
+    )
+    adapter = HTTPAdapter(max_retries=retry_strategy)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def dead_letter(stage, url, error, error_class=None):
+    """记录失败的URL（stage: county/community/property）"""
+    if dead_letters:
+        dead_letters.record(url, stage, error, error_class)
+
+
+def resolve_dead_letter(stage, url):
+    if dead_letters:
+        dead_letters.resolve(url, stage)
+
+
+def new_context(browser, **options):
+    """创建浏览器上下文并启用静态资源缓存；每个县和社区页面都启动新的浏览器，JS/CSS包可以跨页面复用"""
+    context = browser.new_context(**options)
+    if browser_cache:
+        browser_cache.attach(context)
+    return context
+
+
+def wait_for_cards(page, selector, timeout=30000):
+    """等待卡片出现且数量稳定后立即返回，代替 networkidle（统计/埋点请求常常让它一直等不到）；
+    超时仍没有卡片时返回 0"""
+    try:
+        page.wait_for_selector(selector, timeout=timeout)
+    except Exception:
+        return 0
+    count, _ = wait_for_stable_count(playwright_counter(page, selector), quiet_period=1.0, timeout=15)
+    return count
+
+
+def wait_for_page_change(page, selector, previous_href, timeout=30000):
+    """分页后卡片被整体替换、数量不变，先等第一张卡片的链接变化，再等数量稳定"""
+    try:
+        page.wait_for_function(
+            """([selector, previous]) => {
+                const link = document.querySelector(selector + " a");
+                return link && link.getAttribute("href") !== previous;
+            }""",
+            arg=[selector, previous_href],
+            timeout=timeout
+        )
+    except Exception:
+        return 0
+    count, _ = wait_for_stable_count(playwright_counter(page, selector), quiet_period=1.0, timeout=15)
+    return count
+
+
+def absolute_url(href):
+    return href if href.startswith("http") else f"https://www.kbhome.com{href}"
+
+
+def card_links(page, selector):
+    """一次 page.evaluate 取出每张卡片内第一个<a>的href，过滤无效URL"""
+    cards = extract_cards(page, selector, {"href": field("a", attr="href")})
+    return [absolute_url(card["href"]) for card in cards
+            if card["href"] and card["href"] != "#" and len(card["href"]) > 10]
+
+
+def scrape_county_page(county_url):
+    """提取县页面上的所有社区URL；出错时记录死信并返回 None，页面正常但没有社区时返回空列表"""
+    """使用Playwright从县的页面提取所有社区URL"""
+    global current_county, errors
+
+    current_county = county_url
+    print(f"\n{'=' * 50}")
+    print(f"开始处理县: {county_url}")
+    print(f"{'=' * 50}")
+
+    community_urls = []
+
+    with sync_playwright() as p:
+        # 启动浏览器
+        browser = p.chromium.launch(headless=True)
+        context = new_context(
+            browser,
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/101.0.4951.54 Safari/537.36",
+            viewport={"width": 1280, "height": 720}
+        )
+        page = context.new_page()
+
+        try:
+            # 访问县的页面
+            page.goto(county_url, timeout=150000)
+            print(f"✅ 成功访问页面: {county_url}")
+
+            # 等待社区卡片加载完成
+            if wait_for_cards(page, COUNTY_CARD_SELECTOR):
+                print("✅ 页面加载完成")
+            else:
+                print("⚠️ 未等到社区卡片，尝试备用方法")
+
+            # 滚动到底部加载剩余内容，卡片数量稳定后立即继续
+            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            wait_for_stable_count(playwright_counter(page, COUNTY_CARD_SELECTOR), quiet_period=1.0, timeout=15)
+
+            # 一次 page.evaluate 取出容器是否存在以及两种备用方法需要的链接，
+            # 代替逐个元素的 count/nth/get_attribute 往返
+            overview = extract_cards(page, None, {
+                **{selector: field(selector, attr="class") for selector in COMMUNITY_CONTAINER_SELECTORS},
+                "explore": field("a.btn-primary.btn-explore", attr="href", multiple=True),
+                "new_homes": field("a[href^='/new-homes-']", attr="href", multiple=True),
+            })[0]
+            # 查找社区列表容器
+            container = next((selector for selector in COMMUNITY_CONTAINER_SELECTORS
+                              if overview[selector] is not None), None)
+
+            if container:
+                # 提取所有社区项目，优先取"Explore"按钮，否则取第一个链接
+                community_items = extract_cards(page, f"{container} div.row.community-item", {
+                    "href": field(["a.btn-primary.btn-explore", "a"], attr="href"),
+                })
+                print(f"📊 找到 {len(community_items)} 个社区项目")
+
+                community_urls.extend(absolute_url(item["href"]) for item in community_items if item["href"])
+            else:
+                # 在全页面查找所有Explore按钮
+                print(f"🔍 在全页面找到 {len(overview['explore'])} 个Explore按钮")
+                community_urls.extend(absolute_url(href) for href in overview["explore"] if href)
+
+            # 如果仍未找到，尝试备用方法：查找所有社区链接
+            if not community_urls:
+                community_urls.extend(
+                    absolute_url(href) for href in overview["new_homes"]
+                    if href and "/new-homes-" in href and "/" in href[len("/new-homes-"):])
+
+            print(f"✅ 共找到 {len(community_urls)} 个社区URL")
+            return community_urls
+
+        except Exception as e:
+            error_msg = f"提取县社区URL出错: {county_url} | {str(e)}"
+            print(f"⚠️ {error_msg}")
+            errors.append(error_msg)
+            dead_letter("county", county_url, e)
+            return None
+        finally:
+            # 关闭浏览器
+            browser.close()
+
+
+def is_valid_community_url(url):
+    # 过滤掉空URL、锚点URL和过短的URL
+    if not url or url == "#" or len(url) < 10:
+        return False
+
+    # 检查URL路径是否符合社区URL的模式
+    path = url.replace("https://www.kbhome.com", "").lower()
+    if not path.startswith("/new-homes"):
+        return False
+
+    return True
+
+
+def scrape_community_page(community_url):
+    """使用 Playwright 爬取社区页面，提取所有去重后的房源URL；出错时记录死信并返回 None"""
+    global current_community, errors
+
+    current_community = community_url
+    print(f"\n开始处理社区: {community_url}")
+
+    # 使用集合存储URL，自动去重
+    unique_urls = set()
+
+    with sync_playwright() as p:
+        # 启动浏览器
+        browser = p.chromium.launch(headless=True)
+        context = new_context(
+            browser,
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/101.0.4951.54 Safari/537.36"
+        )
+        page = context.new_page()
+
+        try:
+            # 访问社区页面
+            page.goto(community_url, timeout=150000)
+            print(f"✅ 成功访问页面")
+
+            # 等待房源卡片加载完成（已售罄的社区没有卡片，超时后继续）
+            wait_for_cards(page, COMMUNITY_CARD_SELECTOR, timeout=20000)
+
+            # 尝试点击"Move-in Ready Homes"标签
+            try:
+                move_in_tab = page.locator("a#moveinready-tab")
+                if move_in_tab.is_visible():
+                    move_in_tab.click()
+                    # 等待内容加载
+                    wait_for_cards(page, "div#mir div.card-item", timeout=15000)
+            except:
+                pass
+
+            # 提取Personalized Homes和Move-in Ready Homes类型的房源
+            unique_urls.update(card_links(page, COMMUNITY_CARD_SELECTOR))
+
+            # 检查是否有"See all"链接
+            see_all_link = page.locator("div#mir-cards-footer a")
+            if see_all_link.count() > 0:
+                see_all_href = see_all_link.get_attribute("href")
+                if see_all_href:
+                    # 访问"See all"页面
+                    if not see_all_href.startswith("http"):
+                        see_all_href = f"https://www.kbhome.com{see_all_href}"
+
+                    # 创建新页面处理"See all"链接
+                    see_all_page = context.new_page()
+                    see_all_page.goto(see_all_href, timeout=60000)
+                    wait_for_cards(see_all_page, SEE_ALL_CARD_SELECTOR)
+
+                    # 处理分页
+                    pagination = see_all_page.locator("ul.mir-pagination")
+                    if pagination.count() > 0:
+                        # 获取总页数
+                        page_items = pagination.locator("li.pagintation-item")
+                        total_pages = page_items.count()
+
+                        # 处理每一页
+                        for page_num in range(1, total_pages + 1):
+                            if page_num > 1:
+                                # 点击页码
+                                page_btn = see_all_page.locator(
+                                    f"ul.mir-pagination li.pagintation-item:nth-child({page_num}) a")
+                                if page_btn.count() > 0:
+                                    page_btn.click()
+                                    wait_for_page_change(see_all_page, SEE_ALL_CARD_SELECTOR, previous_href)
+
+                            # 提取当前页的房源URL（卡片内第一个<a>标签是主要房源链接）
+                            cards = extract_cards(see_all_page, SEE_ALL_CARD_SELECTOR,
+                                                  {"href": field("a", attr="href")})
+                            previous_href = cards[0]["href"] if cards else None
+                            for card in cards:
+                                href = card["href"]
+                                if href and href != "#" and len(href) > 10:
+                                    unique_urls.add(absolute_url(href))
+
+                    # 关闭"See all"页面
+                    see_all_page.close()
+
+            print(f"✅ 共找到 {len(unique_urls)} 个去重房源链接")
+            return list(unique_urls)
+
+        except Exception as e:
+            error_msg = f"提取社区房源出错: {community_url} | {str(e)}"
+            print(f"⚠️ {error_msg}")
+            errors.append(error_msg)
+            dead_letter("community", community_url, e)
+            return None
+        finally:
+            # 关闭浏览器
+            browser.close()
+
+
+def extract_property_details(soup):
+    """提取房屋属性"""
+    details = {
+        'bedrooms': "",
+        'full_bathrooms': "",
+        'half_bathrooms': "",
+        'garage': "",
+        'floors': "",
+        'sqft': ""
+    }
+
+    # 查找属性容器
+    containers = [
+        soup.find('div', class_='specs-container'),
+        soup.find('div', class_='home-specs'),
+        soup.find('div', class_='specs'),
+        soup.find('div', class_='details-holder')
+    ]
+
+    property_container = None
+    for container in containers:
+        if container:
+            property_container = container
+            break
+
+    # 如果找不到特定容器，尝试查找包含所有属性的行
+    if not property_container:
+        rows = soup.find_all('div', class_='row')
+        if rows:
+            for row in rows:
+                cols = row.find_all('div', class_='col')
+                if cols and len(cols) >= 4:
+                    property_container = row
+                    break
+
+    if property_container:
+        cols = property_container.find_all('div', class_='col')
+        if not cols:
+            cols = property_container.find_all('div', class_='spec-item')
+        if not cols:
+            cols = property_container.find_all('div', recursive=False)
+
+        if cols:
+            # 处理每列数据
+            for col in cols:
+                text = col.get_text(strip=True).upper()
+                if not text:
+                    continue
+
+                # 查找数值元素
+                value_element = col.find('span') or col
+                value_text = value_element.get_text(strip=True) if value_element else ""
+
+                # 提取数字值
+                number_match = re.search(r'[\d\.,]+', value_text)
+                if not number_match:
+                    continue
+
+                value = number_match.group(0).replace(',', '')
+
+                # 匹配属性类型
+                if 'BED' in text or 'BEDS' in text:
+                    details['bedrooms'] = value
+                elif 'BATH' in text or 'BATHS' in text:
+                    if '.' in value:
+                        full, half = value.split('.')
+                        details['full_bathrooms'] = full
+                        details['half_bathrooms'] = "1"
+                    else:
+                        details['full_bathrooms'] = value
+                        details['half_bathrooms'] = "0"
+                elif 'CAR' in text or 'GARAGE' in text:
+                    details['garage'] = value
+                elif 'FLOOR' in text or 'STORY' in text or 'STORIES' in text:
+                    details['floors'] = value
+                elif 'SQ' in text or 'FT' in text or 'SQFT' in text:
+                    details['sqft'] = value
+
+    # 如果仍未找到所有属性，尝试直接搜索整个页面
+    if not all(details.values()):
+        # 尝试在整个页面中搜索各个属性
+        all_divs = soup.find_all(['div', 'span'])
+        for element in all_divs:
+            text = element.get_text(strip=True).upper()
+            if not text:
+                continue
+
+            # 提取数字部分
+            number_match = re.search(r'[\d\.]+', text)
+            if not number_match:
+                continue
+
+            value = number_match.group(0)
+
+            # 检查各个属性类型
+            if 'BED' in text or 'BEDS' in text:
+                details['bedrooms'] = value
+            elif 'BATH' in text or 'BATHS' in text:
+                if '.' in value:
+                    parts = value.split('.')
+                    details['full_bathrooms'] = parts[0]
+                    details['half_bathrooms'] = "1"
+                else:
+                    details['full_bathrooms'] = value
+                    details['half_bathrooms'] = "0"
+            elif 'CAR' in text or 'GARAGE' in text:
+                details['garage'] = value
+            elif 'FLOOR' in text or 'STORY' in text or 'STORIES' in text:
+                details['floors'] = value
+            elif 'SQ' in text or 'FT' in text or 'SQFT' in text:
+                details['sqft'] = value.replace(',', '')
+
+    return details
+
+
+def scrape_home_page(url):
+    """爬取单个房源信息"""
+    global current_house, errors, error_urls, total_homes_scraped
+
+    current_house = url
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/101.0.4951.54 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Connection': 'keep-alive'
+    }
+
+    session = create_session()
+
+    try:
+        # 使用verify=False跳过SSL验证
+        response = session.get(url, headers=headers, verify=False, timeout=30)
+
+        # 检查响应状态
+        if response.status_code != 200:
+            error_msg = f"错误状态码 {response.status_code}: {url}"
+            errors.append(error_msg)
+            error_urls.append(url)  # 添加到错误URL列表
+            dead_letter("property", url, error_msg, error_class="HTTPError")
+            return None
+
+        # 解析HTML
+        soup = BeautifulSoup(response.text, 'html.parser')
+
+        # 从URL中提取社区
+        path_segments = urlparse(url).path.strip('/').split('/')
+        community = path_segments[-2] if len(path_segments) > 1 else ""
+
+        # 从URL中提取home_id
+        parsed_url = urlparse(url)
+        query_params = parse_qs(parsed_url.query)
+
+        # 1. 优先从查询参数获取homesite
+        home_id = query_params.get('homesite', [''])[0]
+
+        # 2. 若查询参数中无homesite，则从路径最后一段提取
+        if not home_id:
+            home_id = path_segments[-1] if path_segments else ""
+
+        # 提取状态
+        status_tag = soup.find('span', class_='tag-label') or soup.find('div', class_='tag-label')
+        status = status_tag.get_text(strip=True) if status_tag else ""
+
+        # 提取地址信息
+        location_div = soup.find('div', class_='location-item') or soup.find('div', class_='address-container')
+        location_text = ""
+        if location_div:
+            a_tag = location_div.find('a', class_='text-link')
+            if not a_tag:
+                a_tag = location_div.find('a', class_='cta-directions')
+
+            if a_tag:
+                location_text = a_tag.get_text(strip=True)
+            else:
+                location_text = location_div.get_text(strip=True)
+
+        # 解析城市、州和邮编
+        city = state = zip_code = ""
+        if location_text:
+            # 尝试两种不同的匹配模式
+            match = re.search(r',\s*([^,]+?)\s*,\s*([A-Z]{2})\s*(\d{5})$', location_text)
+            if not match:
+                match = re.search(r',\s*([^,]+?)\s*,\s*([A-Z]{2})\s*$', location_text)
+
+            if match:
+                city = match.group(1).strip()
+                if len(match.groups()) >= 2:
+                    state = match.group(2).strip()
+                if len(match.groups()) >= 3:
+                    zip_code = match.group(3).strip()
+
+        # 提取价格
+        price = ""
+        price_div = soup.find('div', class_='detail-item') or soup.find('div', class_='price-container')
+        if price_div:
+            price_span = price_div.find('span', class_='price') or price_div.find('span', class_='pl-1')
+            if not price_span:
+                # 尝试其他价格选择器
+                price_span = price_div.find('span', class_=lambda x: x != 'vertical-divider' and x)
+
+            if price_span:
+                price_text = price_span.get_text(strip=True)
+                # 提取数字部分
+                numbers = re.findall(r'[\d,]+', price_text)
+                if numbers:
+                    price = numbers[0].replace(',', '')
+            else:
+                # 尝试直接搜索价格文本
+                price_match = re.search(r'\$\s*([\d,]+)', price_div.get_text())
+                if price_match:
+                    price = price_match.group(1).replace(',', '')
+
+        # 提取房屋属性
+        property_details = extract_property_details(soup)
+
+        # 提取plan和plan_type
+        plan = plan_type = ""
+        title_tag = soup.find('h1', class_='plan-title') or soup.find('h1', class_='home-title')
+        if title_tag:
+            title_text = title_tag.get_text(strip=True)
+            plan = re.sub(r'\s+', ' ', title_text)
+
+            if '|' in title_text:
+                parts = title_text.split('|')
+                plan = parts[-1].strip()
+                if 'Plan' in title_text or 'plan' in title_text:
+                    plan_type = "Home Plan"
+
+        # 准备数据
+        if '|' in location_text:
+            address = location_text.split('|')[-1].split(',')[0].strip()
+        else:
+            address = location_text.split(',')[0].strip() if location_text else ""
+
+        data = {
+            'date_scraped': datetime.now().strftime('%Y-%m-%d'),
+            'builder': 'KB Homes',
+            'brand': 'KB Homes',
+            'community': community,
+            'address': address,
+            'city': city,
+            'state': state,
+            'zip': zip_code,
+            'plan_type': plan_type,
+            'plan': plan,
+            'floors': property_details['floors'],
+            'bedrooms': property_details['bedrooms'],
+            'full_bathrooms': property_details['full_bathrooms'],
+            'half_bathrooms': property_details['half_bathrooms'],
+            'garage': property_details['garage'],
+            'sqft': property_details['sqft'],
+            'price': price,
+            'home_id': home_id,
+            'status': status,
+            'link': url
+        }
+
+        total_homes_scraped += 1
+        resolve_dead_letter("property", url)
+        return data
+
+    except Exception as e:
+        error_msg = f"爬取房源出错: {url} | {str(e)}"
+        errors.append(error_msg)
+        error_urls.append(url)  # 添加到错误URL列表
+        dead_letter("property", url, e)
+        return None
+    finally:
+        session.close()
+
+
+def save_to_csv(data, filename='kb_homes.csv'):
+    """将数据保存到CSV文件，检查重复项"""
+    global written_urls
+
+    if not data:
+        return False
+
+    # 检查URL是否已经写入过
+    if data['link'] in written_urls:
+        return False
+
+    fieldnames = [
+        'date_scraped', 'builder', 'brand', 'community', 'address', 'city',
+        'state', 'zip', 'plan_type', 'plan', 'floors', 'bedrooms',
+        'full_bathrooms', 'half_bathrooms', 'garage', 'sqft', 'price',
+        'home_id', 'status', 'link'
+    ]
+
+    try:
+        with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            if csvfile.tell() == 0:
+                writer.writeheader()
+            writer.writerow(data)
+        written_urls.add(data['link'])  # 添加到已写入集合
+        return True
+    except Exception as e:
+        error_msg = f"保存到CSV失败: {e}"
+        errors.append(error_msg)
+        return False
+
+
+def is_valid_url(url):
+    """检查URL是否是有效的房源URL"""
+    # 过滤掉空URL、锚点URL和过短的URL
+    if not url or url == "#" or len(url) < 10:
+        return False
+
+    # 检查URL路径是否符合房源URL的模式
+    path = url.replace("https://www.kbhome.com", "").lower()
+    if not ("/plan-" in path or "/mir?" in path):
+        return False
+
+    return True
+
+
+def read_county_urls(filename='links.txt'):
+    """从文本文件读取县URL"""
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            urls = [line.strip() for line in f.readlines() if line.strip()]
+        print(f"✅ 从 {filename} 读取了 {len(urls)} 个县URL")
+        return urls
+    except Exception as e:
+        print(f"⚠️ 读取县URL文件失败: {e}")
+        return []
+
+
+def save_error_urls():
+    """保存出错的URL到文件"""
+    global error_urls
+    if error_urls:
+        filename = 'error_urls.txt'
+        with open(filename, 'w', encoding='utf-8') as f:
+            for url in error_urls:
+                f.write(url + '\n')
+        print(f"⚠️ 保存了 {len(error_urls)} 个错误URL到 {filename}")
+
+
+def scrape_community(community_url, csv_filename):
+    """爬取单个社区的所有房源，返回成功写入的房源数"""
+    global last_print_time
+
+    # 获取社区的所有房源URL
+    home_urls = scrape_community_page(community_url)
+    if home_urls is None:
+        return 0  # 出错已记录死信
+
+    # 过滤无效URL
+    valid_home_urls = [url for url in home_urls if is_valid_url(url)]
+
+    if not valid_home_urls:
+        error_msg = f"社区 {community_url} 未找到有效房源，跳过"
+        print(f"⚠️ {error_msg}")
+        errors.append(error_msg)
+        dead_letter("community", community_url, "未找到有效房源")
+        return 0
+    resolve_dead_letter("community", community_url)
+
+    print(f"    找到 {len(valid_home_urls)} 个有效房源")
+
+    # 处理每个房源 - 不再重试，出错直接跳过（失败的房源由死信重放处理）
+    success_count = 0
+    for home_idx, home_url in enumerate(valid_home_urls, 1):
+        # 随机延迟以避免请求过频繁
+        if home_idx % 10 == 0:
+            time.sleep(0.3)
+
+        # 仅尝试一次，出错直接跳过
+        home_data = scrape_home_page(home_url)
+        if home_data:
+            if save_to_csv(home_data, csv_filename):
+                success_count += 1
+
+        # 定期打印进度
+        current_time = time.time()
+        if current_time - last_print_time > print_interval:
+            print(f"    进度: {home_idx}/{len(valid_home_urls)} 房源 | 成功: {success_count}")
+            last_print_time = current_time
+
+    print(f"    社区完成: {success_count}/{len(valid_home_urls)} 房源爬取成功")
+    return success_count
+
+
+def scrape_county(county_url, csv_filename):
+    """爬取单个县的所有社区，返回找到的有效社区数"""
+    # 获取县的所有社区URL
+    community_urls = scrape_county_page(county_url)
+    if community_urls is None:
+        return 0  # 出错已记录死信
+
+    # 过滤无效URL
+    valid_community_urls = [url for url in community_urls if is_valid_community_url(url)]
+
+    if not valid_community_urls:
+        error_msg = f"县 {county_url} 未找到有效社区，跳过"
+        print(f"⚠️ {error_msg}")
+        errors.append(error_msg)
+        dead_letter("county", county_url, "未找到有效社区")
+        return 0
+    resolve_dead_letter("county", county_url)
+
+    print(f"✅ 找到 {len(valid_community_urls)} 个有效社区")
+
+    # 处理每个社区
+    for comm_idx, community_url in enumerate(valid_community_urls, 1):
+        print(f"  处理社区 {comm_idx}/{len(valid_community_urls)}: {community_url}")
+        scrape_community(community_url, csv_filename)
+
+    return len(valid_community_urls)
+
+
+def replay_dead_letters(csv_filename):
+    """逐个重试死信中的URL，成功提取的数据追加到csv_filename"""
+    if not dead_letters:
+        return
+
+    def replay_county(county_url):
+        return scrape_county(county_url, csv_filename) > 0
+
+    def replay_community(community_url):
+        return scrape_community(community_url, csv_filename) > 0
+
+    def replay_property(url):
+        home_data = scrape_home_page(url)
+        if home_data:
+            save_to_csv(home_data, csv_filename)
+        return bool(home_data)
+
+    succeeded, failed = dead_letters.replay({
+        "county": replay_county,
+        "community": replay_community,
+        "property": replay_property,
+    })
+    if succeeded or failed:
+        print(f"\n重放完成: 成功 {succeeded}，仍失败 {failed}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="KB Homes 房源爬虫")
+    parser.add_argument("command", nargs="?", choices=["crawl", "replay"], default="crawl",
+                        help="crawl 为完整爬取(默认)；replay 只重试之前失败的URL")
+    parser.add_argument("--browser-cache", nargs="?", const=DEFAULT_CACHE_DIR, metavar="DIR",
+                        help=f"启用磁盘静态资源缓存，各浏览器实例共享同一目录(默认 {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-replay", action="store_true", help="爬取结束时不自动重放失败的URL")
+    return parser.parse_args()
+
+
+def main():
+    global errors, error_urls, written_urls, total_homes_scraped, browser_cache, dead_letters, last_print_time
+
+    args = parse_args()
+    if args.browser_cache:
+        browser_cache = AssetCache(args.browser_cache)
+    dead_letters = DeadLetterStore(DEAD_LETTER_FILE)
+
+    csv_filename = CSV_FILENAME
+    if args.command == "replay":
+        # 只处理失败的URL，数据追加到上一次爬取的CSV
+        written_urls = set()
+        replay_dead_letters(csv_filename)
+        save_error_urls()
+        return
+
+    # 从文件读取县URL
+    county_urls = read_county_urls('links.txt')
+    if not county_urls:
+        print("没有可用的县URL，程序退出")
+        return
+
+    # 清空或创建CSV文件
+    if os.path.exists(csv_filename):
+        os.remove(csv_filename)
+        print(f"已删除存在的CSV文件: {csv_filename}")
+
+    # 初始化已写入URL集合
+    written_urls = set()
+
+    print(f"开始爬取 {len(county_urls)} 个县的数据...")
+    start_time = time.time()
+    last_print_time = time.time()
+
+    # 处理每个县
+    for county_idx, county_url in enumerate(county_urls, 1):
+        print(f"\n处理县 {county_idx}/{len(county_urls)}: {county_url}")
+        scrape_county(county_url, csv_filename)
+
+        # 更新县进度
+        county_percent = county_idx / len(county_urls) * 100
+        elapsed = time.time() - start_time
+        avg_time_per_county = elapsed / county_idx
+        remaining_counties = len(county_urls) - county_idx
+        estimated_remaining = avg_time_per_county * remaining_counties
+
+        if estimated_remaining > 60:
+            print(f"⏱ 预计剩余时间: {estimated_remaining / 60:.1f} 分钟")
+        else:
+            print(f"⏱ 预计剩余时间: {estimated_remaining:.1f} 秒")
+
+    # 结束前重放本次失败的URL
+    if not args.no_replay:
+        replay_dead_letters(csv_filename)
+
+    # 爬取完成
+    elapsed_total = time.time() - start_time
+    print("\n" + "=" * 50)
+    print(f"✅ 所有县爬取完成! 总耗时: {elapsed_total / 60:.2f} 分钟")
+    print(f"✅ 数据已保存到: {csv_filename}")
+    print(f"✅ 成功爬取房源数量: {total_homes_scraped}")
+    print(f"⚠️ 错误数量: {len(errors)}")
+    print("=" * 50)
+
+    # 保存错误URL到文件
+    save_error_urls()
+
+    # 保存错误日志
+    if errors:
+        with open('crawler_errors.log', 'w', encoding='utf-8') as f:
+            f.write("\n".join(errors))
+        print(f"⚠️ 错误日志已保存到: crawler_errors.log")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        if browser_cache:
+            browser_cache.report()
+        if dead_letters:
+            dead_letters.report()
+            dead_letters.close()
\ No newline at end of file
@@ -11,6 +11,21 @@ import traceback
 import signal  # 用于处理中断信号
 import errno
 import random
+import argparse
+
+from crawl_profiler import enable_profiling, profile_stage, finish_profiling
+from job_queue import JobQueue, run_worker, default_worker_id
+from snapshot_diff import diff_snapshots, print_diff_summary
+from sitemap_discovery import discover_urls, LastmodStore, load_previous_rows
+from page_archive import PageArchive, reextract, DEFAULT_ARCHIVE_DIR
+from home_record import FIELDNAMES, normalize_row
+from crawl_scheduler import CrawlScheduler, parse_duration, link_digest
+from browser_cache import AssetCache, DEFAULT_CACHE_DIR
+from session_state import SessionState
+from dom_extract import extract_cards, field
+from dead_letter import DeadLetterStore
+from selector_health import SelectorHealth
+from listing_store import ListingStore, DEFAULT_STORE_PATH
 
 # 州列表
 ALL_STATES = [
@@ -20,20 +35,84 @@ ALL_STATES = [
     'South Carolina', 'Tennessee', 'Texas', 'Utah', 'Virginia', 'Washington'
 ]
 
+# 站点地图发现模式
+SITEMAP_URLS = ["https://www.tollbrothers.com/sitemap.xml"]
+# 房源页面: /luxury-homes/{州}/{社区}/{户型} 或 /luxury-homes/{州}/{社区}/Quick-Move-In/{ID}
+SITEMAP_PROPERTY_PATTERNS = [
+    r"^https://www\.tollbrothers\.com/luxury-homes/[^/]+/[^/]+/Quick-Move-In/[^/]+/?$",
+    r"^https://www\.tollbrothers\.com/luxury-homes/[^/]+/[^/]+/(?!Quick-Move-In)[^/]+/?$",
+]
+SITEMAP_LASTMOD_FILE = "tollbrothers_sitemap_lastmod.json"
+
+# 各州爬取历史（房源数、变化率、耗时），用于时间预算内的优先级排序
+STATE_HISTORY_FILE = "tollbrothers_state_history.json"
+
 # 错误收集
 global_errors = []
 global_csv_file = None
 
+# 原始页面归档（--no-archive 时为 None）
+page_archive = None
+
+# 浏览器静态资源缓存（未指定 --browser-cache 时为 None）
+browser_cache = None
+
+# 持久化的浏览器会话状态(Cookie/localStorage)，每个上下文启动时加载
+SESSION_STATE_FILE = "tollbrothers_session_state.json"
+session_state = None  # --no-session-state 时为 None
+
+# 失败URL的持久化记录，运行结束时和 replay 命令只重试这些URL
+DEAD_LETTER_FILE = "tollbrothers_dead_letters.sqlite"
+dead_letters = None
+
+# 选择器健康检查：详情页上通常都有值的字段及其选择器
+FIELD_SELECTORS = {
+    "address": 'aside[class*="CommunityHero_heroDetails"]',
+    "zip": 'p.CommunityContactBar_nameSalesTeam__bKVor',
+    "price": 'span.price',
+    "plan_type": 'ul li span',
+    "bedrooms": 'div[class*="CommunityStatBar_statBox"]',
+    "sqft": 'div[class*="CommunityStatBar_statBox"]',
+}
+COMMUNITY_CARD_SELECTOR = 'a.SearchProductCard_view__nYL3F'
+PROPERTY_CARD_SELECTOR = '.ModelCard_modelCardContainer__lXz5R'
+selector_health = None  # --no-health-check 时为 None
+
+# 房源数据库（当前表 + 价格/状态历史），未指定 --store 时为 None
+listing_store = None
+
 # 信号处理
 def signal_handler(sig, frame):
     print("\n\n用户中断程序...")
     print_global_errors()
+    finish_profiling("tollbrothers")
     if global_csv_file and not global_csv_file.closed:
         global_csv_file.close()
     sys.exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
 
+def dead_letter(stage, url, error, error_class=None):
+    """记录失败的URL（stage: state/community/property）"""
+    if dead_letters:
+        dead_letters.record(url, stage, error, error_class)
+
+
+def resolve_dead_letter(stage, url):
+    if dead_letters:
+        dead_letters.resolve(url, stage)
+
+
+def selectors_broken():
+    """选择器健康检查未通过时返回 True，各爬取循环据此立即停止"""
+    return bool(selector_health and selector_health.tripped)
+
+
+def observe_listing(selector, count, page):
+    if selector_health:
+        selector_health.observe_listing(selector, count, page)
+
+
 def print_global_errors():
     """打印全局错误报告"""
     if global_errors:
@@ -49,42 +128,51 @@ def print_global_errors():
         print("\n没有发现错误！")
 
 
+def new_context(browser):
+    """创建浏览器上下文：加载已保存的会话状态并启用静态资源缓存"""
+    context = browser.new_context(**(session_state.playwright_options() if session_state else {}))
+    if browser_cache:
+        browser_cache.attach(context)
+    return context
+
+
 def extract_community_urls(state_url):
     """从州页面提取所有社区URL"""
     with sync_playwright() as p:
         # 启动浏览器
         browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
+        context = new_context(browser)
         page = context.new_page()
 
         print(f"正在访问州页面: {state_url}")
+        loaded = False  # 页面打开后卡片仍未出现才计入选择器健康检查，导航超时不算
         try:
             # 导航到目标URL
-            page.goto(state_url, timeout=120000)
-            page.wait_for_load_state("domcontentloaded", timeout=60000)
-
-            # 确保社区区块加载完成
-            print("等待社区卡片加载...")
-            page.wait_for_selector('.MetroBlock_metroBlock__lkPmw', timeout=60000)
-
-            # 获取页面内容
-            html = page.content()
-            soup = BeautifulSoup(html, 'html.parser')
-
-            # 查找所有社区卡片容器
-            metro_blocks = soup.select('.MetroBlock_metroBlock__lkPmw')
+            with profile_stage("navigation"):
+                page.goto(state_url, timeout=120000)
+            with profile_stage("wait"):
+                page.wait_for_load_state("domcontentloaded", timeout=60000)
+                loaded = True
+
+                # 确保社区区块加载完成
+                print("等待社区卡片加载...")
+                page.wait_for_selector('.MetroBlock_metroBlock__lkPmw', timeout=60000)
+
+            # 在浏览器内一次性取出所有区块中"View Master Plan"按钮的链接
+            with profile_stage("parse"):
+                metro_blocks = extract_cards(page, '.MetroBlock_metroBlock__lkPmw', {
+                    "hrefs": field(COMMUNITY_CARD_SELECTOR, attr="href", multiple=True),
+                })
 
             if not metro_blocks:
                 print("⚠️ 未找到社区区块，请检查页面结构或选择器")
+                observe_listing(COMMUNITY_CARD_SELECTOR, 0, state_url)
                 return []
 
             # 提取所有社区链接
             community_urls = []
             for block in metro_blocks:
-                # 在区块内查找所有"View Master Plan"按钮
-                view_buttons = block.select('a.SearchProductCard_view__nYL3F')
-                for button in view_buttons:
-                    href = button.get('href')
+                for href in block["hrefs"]:
                     if href:
                         # 构建完整URL
                         full_url = urljoin(state_url, href)
@@ -93,11 +181,14 @@ def extract_community_urls(state_url):
             # 去重
             unique_urls = list(set(community_urls))
             print(f"提取到 {len(unique_urls)} 个社区链接")
+            observe_listing(COMMUNITY_CARD_SELECTOR, len(unique_urls), state_url)
 
             return unique_urls
 
         except Exception as e:
             print(f"❌ 提取社区URL时出错: {str(e)}")
+            if loaded:
+                observe_listing(COMMUNITY_CARD_SELECTOR, 0, state_url)
             traceback.print_exc()
             global_errors.append({
                 "type": "州页面",
@@ -117,13 +208,126 @@ def extract_community_urls(state_url):
                 pass
 
 
+def parse_tollbrothers_page(soup, url):
+    """从已解析的房源页面中提取结构化数据"""
+    with profile_stage("extract"):
+        # 提取基础信息
+        url_parts = url.split('/')
+        state = url_parts[4] if len(url_parts) > 4 else ""
+        community = url_parts[5] if len(url_parts) > 5 else ""
+
+        # 提取home_id和status(分类)
+        if "Quick-Move-In" in url_parts:
+            # Quick-Move-In类型URL
+            status = "Quick Move In"
+            home_id = url_parts[-1]  # 最后部分是数字ID
+        else:
+            # Home Design类型URL
+            status = "Home Design"
+            home_id = url_parts[-1]  # 最后部分是设计名称
+
+        # 当前日期
+        date_scraped = datetime.datetime.now().strftime('%Y-%m-%d')
+
+        # 提取地址信息
+        address_block = soup.select_one('aside[class*="CommunityHero_heroDetails"]')
+        address = ""
+        if address_block:
+            # 提取地址文本并清理
+            address_text = address_block.get_text(strip=True)
+            # 移除管道符号后的县名部分
+            if '|' in address_text:
+                address = address_text.split('|')[0].strip()
+
+        # 城市和邮编
+        city = ""
+        zip_code = ""
+
+        # 查找所有销售团队信息标签
+        sales_team_tags = soup.select('p.CommunityContactBar_nameSalesTeam__bKVor')
+        for tag in sales_team_tags:
+            text = tag.get_text(strip=True)
+            city_match = re.search(r'^([^,]+),', text)
+            if city_match:
+                city = city_match.group(1).strip()
+
+            # 提取邮编（5位数字）
+            zip_match = re.search(r'\d{5}', text)
+            if zip_match:
+                zip_code = zip_match.group()
+
+        # 提取价格
+        price_element = soup.select_one('span.price')
+        price = price_element.get_text(strip=True).replace('$', '').replace(',', '') if price_element else ""
+
+        # 提取房屋类型
+        plan_type_element = soup.select_one('ul li span')
+        plan_type = plan_type_element.get_text(strip=True) if plan_type_element else ""
+
+        # 提取户型信息
+        stats_section = soup.select('div[class*="CommunityStatBar_statBox"]')
+        bedrooms = ""
+        full_bathrooms = ""
+        half_bathrooms = ""
+        garage = ""
+        sqft = ""
+        floors = ""
+
+        for stat in stats_section:
+            title = stat.select_one('p[class*="CommunityStatBar_statTitle"]')
+            if not title:
+                continue
+
+            value = stat.select_one('p[class*="CommunityStatBar_statNumber"]').get_text(
+                strip=True) if stat.select_one(
+                'p[class*="CommunityStatBar_statNumber"]') else ""
+
+            if "Bedrooms" in title.get_text():
+                bedrooms = value
+            elif "Bathrooms" in title.get_text():
+                full_bathrooms = value
+            elif "Half Baths" in title.get_text():
+                half_bathrooms = value
+            elif "Garages" in title.get_text():
+                garage = value
+            elif "Square Footage" in title.get_text():
+                sqft = value.replace(',', '')
+            elif "Stories" in title.get_text():
+                floors = value
+
+        # 返回结构化数据
+        return {
+            "date_scraped": date_scraped,
+            "builder": "Toll Brothers",
+            "brand": "Toll Brothers",
+            "community": community.replace('-', ' '),
+            "address": address,
+            "city": city,
+            "state": state,
+            "zip": zip_code,
+            "plan_type": plan_type,
+            "plan": plan_type,  # 根据需求使用相同值
+            "floors": floors,
+            "bedrooms": bedrooms,
+            "full_bathrooms": full_bathrooms,
+            "half_bathrooms": half_bathrooms,
+            "garage": garage,
+            "sqft": sqft,
+            "price": price,
+            "home_id": home_id,
+            "status": status,
+            "link": url
+        }
+
+
 def extract_tollbrothers_data(url, max_retries=3):
     retry_count = 0
+    last_error = None
     while retry_count < max_retries:
         with sync_playwright() as p:
             # 启动浏览器
             browser = p.chromium.launch(headless=True)
-            context = browser.new_context()
+            context = new_context(browser)
 
             # 设置更长的默认超时
             context.set_default_timeout(120000)
@@ -134,11 +338,13 @@ def extract_tollbrothers_data(url, max_retries=3):
                 print(f"正在访问房源页面: {url}")
 
                 # 导航到目标URL
-                response = page.goto(url, timeout=120000, wait_until="domcontentloaded")
+                with profile_stage("navigation"):
+                    response = page.goto(url, timeout=120000, wait_until="domcontentloaded")
 
                 # 检查响应状态
                 if response and response.status >= 400:
                     print(f"⚠️ 页面响应错误: HTTP {response.status} - {url}")
+                    last_error = f"HTTP {response.status}"
                     retry_count += 1
                     time.sleep(3)
                     continue
@@ -148,128 +354,37 @@ def extract_tollbrothers_data(url, max_retries=3):
                     print(f"⚠️ 页面重定向到: {page.url} (原始: {url})")
 
                 try:
-                    # 等待地址信息块
-                    page.wait_for_selector('aside[class*="CommunityHero_heroDetails"]', timeout=60000)
-                    # 等待价格元素
-                    page.wait_for_selector('span.price', timeout=30000, state="attached")
-                    # 等待户型信息
-                    page.wait_for_selector('div[class*="CommunityStatBar_statBox"]', timeout=30000)
+                    with profile_stage("wait"):
+                        # 等待地址信息块
+                        page.wait_for_selector('aside[class*="CommunityHero_heroDetails"]', timeout=60000)
+                        # 等待价格元素
+                        page.wait_for_selector('span.price', timeout=30000, state="attached")
+                        # 等待户型信息
+                        page.wait_for_selector('div[class*="CommunityStatBar_statBox"]', timeout=30000)
                 except Exception as e:
                     print(f"⚠️ 等待元素警告: {str(e)} - 继续提取可能不完整的数据")
 
                 # 获取页面内容
-                html = page.content()
-                soup = BeautifulSoup(html, 'html.parser')
-
-                # 提取基础信息
-                url_parts = url.split('/')
-                state = url_parts[4] if len(url_parts) > 4 else ""
-                community = url_parts[5] if len(url_parts) > 5 else ""
-
-                # 提取home_id和status(分类)
-                if "Quick-Move-In" in url_parts:
-                    # Quick-Move-In类型URL
-                    status = "Quick Move In"
-                    home_id = url_parts[-1]  # 最后部分是数字ID
-                else:
-                    # Home Design类型URL
-                    status = "Home Design"
-                    home_id = url_parts[-1]  # 最后部分是设计名称
-
-                # 当前日期
-                date_scraped = datetime.datetime.now().strftime('%Y-%m-%d')
-
-                # 提取地址信息
-                address_block = soup.select_one('aside[class*="CommunityHero_heroDetails"]')
-                address = ""
-                if address_block:
-                    # 提取地址文本并清理
-                    address_text = address_block.get_text(strip=True)
-                    # 移除管道符号后的县名部分
-                    if '|' in address_text:
-                        address = address_text.split('|')[0].strip()
-
-                # 城市和邮编
-                city = ""
-                zip_code = ""
-
-                # 查找所有销售团队信息标签
-                sales_team_tags = soup.select('p.CommunityContactBar_nameSalesTeam__bKVor')
-                for tag in sales_team_tags:
-                    text = tag.get_text(strip=True)
-                    city_match = re.search(r'^([^,]+),', text)
-                    if city_match:
-                        city = city_match.group(1).strip()
-
-                    # 提取邮编（5位数字）
-                    zip_match = re.search(r'\d{5}', text)
-                    if zip_match:
-                        zip_code = zip_match.group()
-
-                # 提取价格
-                price_element = soup.select_one('span.price')
-                price = price_element.get_text(strip=True).replace('$', '').replace(',', '') if price_element else ""
-
-                # 提取房屋类型
-                plan_type_element = soup.select_one('ul li span')
-                plan_type = plan_type_element.get_text(strip=True) if plan_type_element else ""
-
-                # 提取户型信息
-                stats_section = soup.select('div[class*="CommunityStatBar_statBox"]')
-                bedrooms = ""
-                full_bathrooms = ""
-                half_bathrooms = ""
-                garage = ""
-                sqft = ""
-                floors = ""
-
-                for stat in stats_section:
-                    title = stat.select_one('p[class*="CommunityStatBar_statTitle"]')
-                    if not title:
-                        continue
-
-                    value = stat.select_one('p[class*="CommunityStatBar_statNumber"]').get_text(
-                        strip=True) if stat.select_one(
-                        'p[class*="CommunityStatBar_statNumber"]') else ""
-
-                    if "Bedrooms" in title.get_text():
-                        bedrooms = value
-                    elif "Bathrooms" in title.get_text():
-                        full_bathrooms = value
-                    elif "Half Baths" in title.get_text():
-                        half_bathrooms = value
-                    elif "Garages" in title.get_text():
-                        garage = value
-                    elif "Square Footage" in title.get_text():
-                        sqft = value.replace(',', '')
-                    elif "Stories" in title.get_text():
-                        floors = value
-
-                # 返回结构化数据
-                return {
-                    "date_scraped": date_scraped,
-                    "builder": "Toll Brothers",
-                    "brand": "Toll Brothers",
-                    "community": community.replace('-', ' '),
-                    "address": address,
-                    "city": city,
-                    "state": state,
-                    "zip": zip_code,
-                    "plan_type": plan_type,
-                    "plan": plan_type,  # 根据需求使用相同值
-                    "floors": floors,
-                    "bedrooms": bedrooms,
-                    "full_bathrooms": full_bathrooms,
-                    "half_bathrooms": half_bathrooms,
-                    "garage": garage,
-                    "sqft": sqft,
-                    "price": price,
-                    "home_id": home_id,
-                    "status": status,
-                    "link": url
-                }
-
-            except TimeoutError:
+                with profile_stage("parse"):
+                    html = page.content()
+                    soup = BeautifulSoup(html, 'html.parser')
+
+                # 归档原始页面，选择器失效时可离线重新提取
+                if page_archive:
+                    page_archive.store(url, html, response.status if response else None)
+
+                # 每次运行在第一个成功的房源页面后刷新一次会话状态
+                if session_state and not session_state.saved:
+                    session_state.save_playwright(context)
+
+                data = parse_tollbrothers_page(soup, url)
+                if selector_health:
+                    selector_health.observe_row(data)
+                resolve_dead_letter("property", url)
+                return data
+
+            except TimeoutError as e:
+                last_error = e
                 retry_count += 1
                 print(f"⏱️ 超时重试 ({retry_count}/{max_retries}): {url}")
                 time.sleep(5)  # 重试前等待
@@ -281,6 +396,7 @@ def extract_tollbrothers_data(url, max_retries=3):
                     "url": url,
                     "error": f"提取数据失败: {str(e)}"
                 })
+                dead_letter("property", url, e)
                 return None
             finally:
                 # 安全关闭浏览器
@@ -299,6 +415,10 @@ def extract_tollbrothers_data(url, max_retries=3):
         "url": url,
         "error": "达到最大重试次数仍失败"
     })
+    if isinstance(last_error, BaseException):
+        dead_letter("property", url, last_error)
+    else:
+        dead_letter("property", url, last_error or "达到最大重试次数仍失败", error_class="HTTPError")
     return None
 
 
@@ -307,27 +427,31 @@ def extract_property_urls(community_url):
     with sync_playwright() as p:
         # 启动浏览器
         browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
+        context = new_context(browser)
         page = context.new_page()
+        loaded = False  # 页面打开后卡片仍未出现才计入选择器健康检查，导航超时不算
 
         try:
             # 导航到目标URL
-            page.goto(community_url, timeout=120000)
-            page.wait_for_load_state("domcontentloaded", timeout=60000)
-
-            # 确保房源卡片加载完成
-            print("等待房源卡片加载...")
-            page.wait_for_selector('.ModelCard_modelCardContainer__lXz5R', timeout=60000)
-
-            # 获取页面内容
-            html = page.content()
-            soup = BeautifulSoup(html, 'html.parser')
-
-            # 查找所有房源卡片容器
-            card_containers = soup.select('.ModelCard_modelCardContainer__lXz5R')
+            with profile_stage("navigation"):
+                page.goto(community_url, timeout=120000)
+            with profile_stage("wait"):
+                page.wait_for_load_state("domcontentloaded", timeout=60000)
+                loaded = True
+
+                # 确保房源卡片加载完成
+                print("等待房源卡片加载...")
+                page.wait_for_selector(PROPERTY_CARD_SELECTOR, timeout=60000)
+
+            # 在浏览器内一次性取出所有房源卡片的链接
+            with profile_stage("parse"):
+                card_containers = extract_cards(page, PROPERTY_CARD_SELECTOR, {
+                    "href": field('a', attr="href"),
+                })
 
             if not card_containers:
                 print("⚠️ 未找到房源卡片，请检查页面结构或选择器")
+                observe_listing(PROPERTY_CARD_SELECTOR, 0, community_url)
                 return []
 
             print(f"找到 {len(card_containers)} 个房源卡片")
@@ -335,20 +459,22 @@ def extract_property_urls(community_url):
             # 提取所有房源链接
             property_urls = []
             for container in card_containers:
-                link_element = container.find('a')
-                if link_element and link_element.get('href'):
+                if container["href"]:
                     # 构建完整URL
-                    full_url = urljoin(community_url, link_element['href'])
+                    full_url = urljoin(community_url, container["href"])
                     property_urls.append(full_url)
 
             # 去重
             unique_urls = list(set(property_urls))
             print(f"提取到 {len(unique_urls)} 个唯一房源链接")
+            observe_listing(PROPERTY_CARD_SELECTOR, len(unique_urls), community_url)
 
             return unique_urls
 
         except Exception as e:
             print(f"❌ 提取房源URL时出错: {str(e)}")
+            if loaded:
+                observe_listing(PROPERTY_CARD_SELECTOR, 0, community_url)
             traceback.print_exc()
             global_errors.append({
                 "type": "社区",
@@ -388,19 +514,18 @@ def save_to_csv(data, filename="tollbrothers_homes.csv"):
                 global_csv_file = csvfile  # 保存文件引用
 
                 # 写入数据
-                fieldnames = [
-                    "date_scraped", "builder", "brand", "community", "address", "city",
-                    "state", "zip", "plan_type", "plan", "floors", "bedrooms",
-                    "full_bathrooms", "half_bathrooms", "garage", "sqft", "price",
-                    "home_id", "status", "link"
-                ]
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
 
                 if not file_exists:
                     writer.writeheader()
 
-                writer.writerow(data)
+                with profile_stage("write"):
+                    writer.writerow(normalize_row(data))
 
+            if listing_store:
+                with profile_stage("write"):
+                    listing_store.add(data)
+            return
 
         except PermissionError:
             if attempt < max_retries - 1:
@@ -424,13 +549,15 @@ def print_progress(current, total, prefix=""):
     sys.stdout.flush()
 
 
-def scrape_community(community_url, csv_filename):
-    """爬取整个社区的所有房源信息"""
+def scrape_community(community_url, csv_filename, property_urls=None):
+    """爬取整个社区的所有房源信息；property_urls 为调用方已提取的房源链接，None 时打开社区页面提取"""
     print(f"\n开始爬取社区: {community_url}")
 
     try:
         # 获取所有房源链接
-        property_urls = extract_property_urls(community_url)
+        if property_urls is None:
+            with profile_stage("discovery"):
+                property_urls = extract_property_urls(community_url)
 
         if not property_urls:
             print("❌ 未提取到任何房源URL，请检查输入或网站结构")
@@ -439,13 +566,17 @@ def scrape_community(community_url, csv_filename):
                 "url": community_url,
                 "error": "未找到房源卡片"
             })
+            dead_letter("community", community_url, "未找到房源卡片")
             return 0  # 返回0表示没有房源
 
+        resolve_dead_letter("community", community_url)
         print(f"找到 {len(property_urls)} 个房源")
 
         # 爬取每个房源
         success_count = 0
         for i, url in enumerate(property_urls, 1):
+            if selectors_broken():
+                break
             try:
                 print_progress(i, len(property_urls), f"房源爬取进度: ")
                 property_data = extract_tollbrothers_data(url)
@@ -460,6 +591,7 @@ def scrape_community(community_url, csv_filename):
                     "url": url,
                     "error": str(e)
                 })
+                dead_letter("property", url, e)
 
         print(f"\n社区爬取完成: 成功提取 {success_count}/{len(property_urls)} 个房源")
         return success_count
@@ -472,11 +604,13 @@ def scrape_community(community_url, csv_filename):
             "url": community_url,
             "error": str(e)
         })
+        dead_letter("community", community_url, e)
         return 0
 
 
-def scrape_state(state, csv_filename):
-    """爬取整个州的所有房源信息"""
+def scrape_state(state, csv_filename, seen_urls=None, scheduler=None):
+    """爬取整个州的所有房源信息；seen_urls 不为 None 时收集发现的房源链接，
+    scheduler 不为 None 时每个社区开始前检查时间预算，预算不足时推迟州内剩余的社区"""
     state_url = f"https://www.tollbrothers.com/luxury-homes/{state}"
     print(f"\n{'=' * 80}")
     print(f"开始爬取州: {state}")
@@ -485,7 +619,8 @@ def scrape_state(state, csv_filename):
 
     try:
         # 提取所有社区URL
-        community_urls = extract_community_urls(state_url)
+        with profile_stage("discovery"):
+            community_urls = extract_community_urls(state_url)
 
         if not community_urls:
             print("❌ 未提取到任何社区URL，请检查输入或网站结构")
@@ -494,8 +629,10 @@ def scrape_state(state, csv_filename):
                 "url": state_url,
                 "error": "未找到社区卡片"
             })
+            dead_letter("state", state_url, "未找到社区卡片")
             return 0, 0, 0
 
+        resolve_dead_letter("state", state_url)
         print(f"找到 {len(community_urls)} 个社区")
 
         # 爬取每个社区
@@ -505,14 +642,27 @@ def scrape_state(state, csv_filename):
         start_time = time.time()
 
         for i, community_url in enumerate(community_urls, 1):
+            if selectors_broken():
+                break
+            # 按本州已完成社区的平均耗时估计下一个社区
+            if scheduler and i > 1 and not scheduler.has_time_for((time.time() - start_time) / (i - 1)):
+                skipped = community_urls[i - 1:]
+                print(f"\n⏭️ 时间预算不足，推迟州 {state} 剩余的 {len(skipped)} 个社区")
+                scheduler.defer(state, f"时间预算不足，{len(skipped)}/{total_communities} 个社区未爬取",
+                                parts=skipped, crawled_links=seen_urls or [])
+                break
             print(f"\n{'=' * 80}")
             print(f"社区进度 ({i}/{total_communities}): {community_url}")
             print(f"{'=' * 80}")
 
             # 爬取当前社区
-            homes_in_community = extract_property_urls(community_url) or []
+            with profile_stage("discovery"):
+                homes_in_community = extract_property_urls(community_url) or []
+            if seen_urls is not None:
+                seen_urls.extend(homes_in_community)
             total_homes += len(homes_in_community)
-            success_count = scrape_community(community_url, csv_filename)
+            # 已提取的链接直接交给 scrape_community，每个社区页面只打开一次
+            success_count = scrape_community(community_url, csv_filename, homes_in_community)
             total_success += success_count
 
             # 显示当前社区完成状态
@@ -542,14 +692,88 @@ def scrape_state(state, csv_filename):
             "url": state_url,
             "error": str(e)
         })
+        dead_letter("state", state_url, e)
         return 0, 0, 0
 
 
-def scrape_all_states(csv_filename="tollbrothers_all_homes.csv"):
-    """爬取所有州的数据"""
+def scrape_from_sitemap(csv_filename, previous_csv=None):
+    """从站点地图发现房源URL并直接提取；lastmod未变化的房源沿用上一次快照的数据"""
+    entries = discover_urls(SITEMAP_URLS, SITEMAP_PROPERTY_PATTERNS)
+    if not entries:
+        print("❌ 站点地图中未找到任何房源URL，请检查站点地图地址或匹配模式")
+        global_errors.append({
+            "type": "站点地图",
+            "url": ", ".join(SITEMAP_URLS),
+            "error": "未匹配到房源URL"
+        })
+        return 0, 0
+
+    lastmod_store = LastmodStore(SITEMAP_LASTMOD_FILE)
+    unchanged = {url for url, lastmod in entries.items() if lastmod_store.is_unchanged(url, lastmod)}
+    previous_rows = load_previous_rows(previous_csv, unchanged)
+    print(f"站点地图发现 {len(entries)} 个房源，其中 {len(previous_rows)} 个未变化，沿用上次数据")
+
+    today = datetime.datetime.now().strftime('%Y-%m-%d')
+    success_count = 0
+    for i, (url, lastmod) in enumerate(entries.items(), 1):
+        if selectors_broken():
+            break
+        print_progress(i, len(entries), "房源爬取进度: ")
+        try:
+            if url in previous_rows:
+                property_data = previous_rows[url]
+                property_data["date_scraped"] = today
+            else:
+                property_data = extract_tollbrothers_data(url)
+            if property_data:
+                save_to_csv(property_data, csv_filename)
+                lastmod_store.update(url, lastmod)
+                success_count += 1
+        except Exception as e:
+            print(f"\n❌ 处理房源 {url} 时出错: {str(e)}")
+            traceback.print_exc()
+            global_errors.append({
+                "type": "房源",
+                "url": url,
+                "error": str(e)
+            })
+            dead_letter("property", url, e)
+
+        # 定期保存lastmod记录，中断后也能复用
+        if i % 50 == 0:
+            lastmod_store.save()
+
+    lastmod_store.save()
+    print(f"\n站点地图爬取完成: 成功提取 {success_count}/{len(entries)} 个房源")
+    return len(entries), success_count
+
+
+def carry_forward_deferred(backup_name, csv_filename, scheduler):
+    """把被时间预算推迟的州在旧文件中的房源原样写入新文件（保留原爬取日期），
+    否则这些房源会从全量文件中消失，并在快照对比中被误判为下架"""
+    digests = scheduler.deferred_links()
+    if not backup_name or not digests:
+        return 0
+    count = 0
+    with open(backup_name, 'r', newline='', encoding='utf-8') as src, \
+            open(csv_filename, 'a', newline='', encoding='utf-8') as dst:
+        writer = csv.DictWriter(dst, fieldnames=FIELDNAMES, extrasaction='ignore')
+        for row in csv.DictReader(src):
+            if row.get("link") and link_digest(row["link"]) in digests:
+                writer.writerow(row)
+                count += 1
+    print(f"\n已沿用 {len(scheduler.deferred)} 个推迟州的上次数据: {count} 个房源")
+    return count
+
+
+def scrape_all_states(csv_filename="tollbrothers_all_homes.csv", discovery="browser", scheduler=None, replay=True):
+    """爬取所有州的数据；scheduler 决定州的顺序以及时间预算内哪些州被推迟，
+    replay 为 True 时在结束前重放本次失败的URL"""
+    scheduler = scheduler or CrawlScheduler(STATE_HISTORY_FILE)
     # 备份已存在的CSV文件
+    backup_name = None
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     if os.path.exists(csv_filename):
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_name = f"tollbrothers_backup_{timestamp}.csv"
         os.rename(csv_filename, backup_name)
         print(f"已备份旧文件为: {backup_name}")
@@ -563,34 +787,50 @@ def scrape_all_states(csv_filename="tollbrothers_all_homes.csv"):
 
     # 创建CSV文件并写入表头
     with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = [
-            "date_scraped", "builder", "brand", "community", "address", "city",
-            "state", "zip", "plan_type", "plan", "floors", "bedrooms",
-            "full_bathrooms", "half_bathrooms", "garage", "sqft", "price",
-            "home_id", "status", "link"
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
         writer.writeheader()
 
-    # 遍历所有州
-    for i, state in enumerate(ALL_STATES, 1):
-        print(f"\n\n{'#' * 80}")
-        print(f"开始处理州 ({i}/{total_states}): {state}")
-        print(f"{'#' * 80}")
+    if discovery == "sitemap":
+        # 站点地图模式：直接从XML获取房源URL，跳过州和社区页面的浏览器渲染
+        total_homes, total_success = scrape_from_sitemap(csv_filename, backup_name)
+    else:
+        # 遍历所有州
+        for i, state in enumerate(scheduler.order(ALL_STATES), 1):
+            if not scheduler.should_start(state):
+                print(f"\n⏭️ 推迟州 ({i}/{total_states}): {state}，时间预算不足")
+                continue
+
+            print(f"\n\n{'#' * 80}")
+            print(f"开始处理州 ({i}/{total_states}): {state}")
+            print(f"{'#' * 80}")
+
+            # 爬取当前州
+            state_start = time.time()
+            state_urls = []
+            communities, homes, success = scrape_state(state, csv_filename, state_urls, scheduler)
+            if selectors_broken():
+                # 中途停止的州数据不完整，不计入爬取历史
+                break
+            if not scheduler.is_deferred(state):
+                # 中途推迟的州同样不完整，其余社区沿用上次数据
+                scheduler.record(state, state_urls, time.time() - state_start, success=communities > 0)
+            total_communities += communities
+            total_homes += homes
+            total_success += success
+
+            # 显示当前州完成状态
+            print(f"\n州完成: {state}")
+            print(f"当前州成功提取: {success}/{homes} 个房源")
+            print(f"累计成功提取: {total_success}/{total_homes} 个房源")
 
-        # 爬取当前州
-        communities, homes, success = scrape_state(state, csv_filename)
-        total_communities += communities
-        total_homes += homes
-        total_success += success
+            # 州之间暂停，避免请求过于频繁；时间紧张时缩短
+            scheduler.pause(3, 7)
 
-        # 显示当前州完成状态
-        print(f"\n州完成: {state}")
-        print(f"当前州成功提取: {success}/{homes} 个房源")
-        print(f"累计成功提取: {total_success}/{total_homes} 个房源")
+        carry_forward_deferred(backup_name, csv_filename, scheduler)
 
-        # 州之间暂停，避免请求过于频繁
-        time.sleep(random.uniform(3, 7))
+    # 重放失败的URL，结果写入同一个CSV，参与随后的快照对比
+    if replay and scheduler.remaining() > 0 and not selectors_broken():
+        replay_dead_letters(csv_filename)
 
     # 计算总耗时
     overall_elapsed = time.time() - overall_start
@@ -606,11 +846,163 @@ def scrape_all_states(csv_filename="tollbrothers_all_homes.csv"):
     print(f"所有数据已保存到 {csv_filename}")
     print(f"{'=' * 80}")
 
+    # 与上一次快照对比，生成变更增量；选择器失效时数据不完整，对比会把大量房源误判为下架
+    if backup_name and not selectors_broken():
+        changes_file = f"tollbrothers_changes_{timestamp}.jsonl"
+        try:
+            counts = diff_snapshots(backup_name, csv_filename, changes_file)
+            print_diff_summary(counts, changes_file)
+        except Exception as e:
+            print(f"❌ 快照对比失败: {str(e)}")
+            traceback.print_exc()
+
+    if discovery != "sitemap":
+        scheduler.report()
+
     # 打印错误报告
     print_global_errors()
 
 
+def replay_dead_letters(csv_filename):
+    """逐个重试死信中的URL，成功提取的数据追加到csv_filename"""
+    if not dead_letters:
+        return
+
+    def replay_state(state_url):
+        communities, _, _ = scrape_state(state_url.rstrip('/').rsplit('/', 1)[-1], csv_filename)
+        return communities > 0
+
+    def replay_community(community_url):
+        return scrape_community(community_url, csv_filename) > 0
+
+    def replay_property(url):
+        property_data = extract_tollbrothers_data(url)
+        if property_data:
+            save_to_csv(property_data, csv_filename)
+        return bool(property_data)
+
+    succeeded, failed = dead_letters.replay({
+        "state": replay_state,
+        "community": replay_community,
+        "property": replay_property,
+    })
+    if succeeded or failed:
+        print(f"\n重放完成: 成功 {succeeded}，仍失败 {failed}")
+
+
+def run_queue_worker(queue_path, csv_filename, worker_id=None, lease_seconds=300):
+    """作为队列工作进程运行：多个进程共享同一个队列文件，共同完成一次爬取"""
+    worker_id = worker_id or default_worker_id()
+    queue = JobQueue(queue_path, lease_seconds=lease_seconds)
+
+    # 每个进程都可以安全地播种，已存在的任务会被忽略
+    added = queue.enqueue_many("state", [(state, {"state": state}) for state in ALL_STATES], priority=2)
+    if added:
+        print(f"📋 已将 {added} 个州加入队列: {queue_path}")
+
+    def handle_state(payload):
+        state_url = f"https://www.tollbrothers.com/luxury-homes/{payload['state']}"
+        with profile_stage("discovery"):
+            community_urls = extract_community_urls(state_url)
+        if not community_urls:
+            raise RuntimeError(f"未找到社区卡片: {state_url}")
+        added = queue.enqueue_many("community", [(url, {"url": url}) for url in community_urls], priority=1)
+        print(f"📋 州 {payload['state']}: 新增 {added}/{len(community_urls)} 个社区任务")
+
+    def handle_community(payload):
+        with profile_stage("discovery"):
+            property_urls = extract_property_urls(payload["url"])
+        if not property_urls:
+            raise RuntimeError(f"未找到房源卡片: {payload['url']}")
+        added = queue.enqueue_many("property", [(url, {"url": url}) for url in property_urls])
+        print(f"📋 社区: 新增 {added}/{len(property_urls)} 个房源任务")
+
+    def handle_property(payload):
+        property_data = extract_tollbrothers_data(payload["url"])
+        if not property_data:
+            raise RuntimeError(f"提取房源数据失败: {payload['url']}")
+        save_to_csv(property_data, csv_filename)
+
+    start_time = time.time()
+    processed = run_worker(queue, worker_id, {
+        "state": handle_state,
+        "community": handle_community,
+        "property": handle_property,
+    }, should_stop=selectors_broken)
+    counts = queue.counts()
+    queue.close()
+
+    print(f"\n{'=' * 80}")
+    print(f"工作进程 {worker_id} 完成: 处理 {processed} 个任务，耗时 {time.time() - start_time:.2f}秒")
+    print(f"队列状态: 待处理 {counts['pending']} | 进行中 {counts['leased']} | "
+          f"完成 {counts['done']} | 失败 {counts['failed']}")
+    print(f"本进程数据已保存到 {csv_filename}")
+    print(f"{'=' * 80}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Toll Brothers 房源爬虫")
+    parser.add_argument("command", nargs="?", choices=["crawl", "reextract", "replay"], default="crawl",
+                        help="crawl 在线爬取(默认); reextract 从页面归档离线重新提取，不访问网络; "
+                             "replay 只重试之前失败的URL")
+    parser.add_argument("--profile", action="store_true",
+                        help="开启性能分析，按阶段输出火焰图折叠栈和热点汇总")
+    parser.add_argument("--profile-interval", type=float, default=5.0,
+                        help="性能分析采样间隔(毫秒)")
+    parser.add_argument("--profile-top", type=int, default=20,
+                        help="热点汇总中每个阶段显示的函数数量")
+    parser.add_argument("--queue", metavar="PATH",
+                        help="共享任务队列(SQLite)路径；多个进程指向同一文件即可分担同一次爬取")
+    parser.add_argument("--worker-id", help="工作进程标识，默认为 主机名-进程号")
+    parser.add_argument("--lease-seconds", type=int, default=300,
+                        help="任务租约时长(秒)，进程崩溃后超过该时长任务重新入队")
+    parser.add_argument("--discovery", choices=["browser", "sitemap"], default="browser",
+                        help="房源发现方式: browser 渲染州/社区页面; sitemap 读取XML站点地图")
+    parser.add_argument("--archive-dir", default=DEFAULT_ARCHIVE_DIR, help="原始页面归档目录")
+    parser.add_argument("--no-archive", action="store_true", help="不归档抓取的页面")
+    parser.add_argument("--no-session-state", action="store_true",
+                        help="不加载/保存浏览器会话状态，每个上下文都从空会话开始")
+    parser.add_argument("--reextract-date", metavar="YYYY-MM-DD",
+                        help="reextract 时只使用该日期抓取的页面，默认每个URL取最新一次")
+    parser.add_argument("--workers", type=int, help="reextract 并行进程数，默认为CPU核数")
+    parser.add_argument("--browser-cache", nargs="?", const=DEFAULT_CACHE_DIR, metavar="DIR",
+                        help=f"启用磁盘静态资源缓存，各浏览器实例和队列进程共享同一目录(默认 {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--store", nargs="?", const=DEFAULT_STORE_PATH, metavar="PATH",
+                        help=f"同时写入SQLite房源数据库(默认 {DEFAULT_STORE_PATH})，保存当前状态和价格/状态历史")
+    parser.add_argument("--no-health-check", action="store_true",
+                        help="关闭选择器健康检查（字段提取率过低时不提前停止）")
+    parser.add_argument("--no-replay", action="store_true", help="爬取结束时不自动重放失败的URL")
+    parser.add_argument("--time-budget", metavar="DURATION",
+                        help="本次爬取的时间预算，如 5400、90m、2h；设置后按历史优先级排序并推迟放不下的州")
+    return parser.parse_args()
+
+
 def main():
+    global page_archive, browser_cache, session_state, dead_letters, selector_health, listing_store
+
+    args = parse_args()
+    if args.profile:
+        enable_profiling(interval=args.profile_interval / 1000, top_n=args.profile_top)
+
+    if args.command == "reextract":
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        reextract(parse_tollbrothers_page, "Toll Brothers", f"tollbrothers_reextract_{timestamp}.csv",
+                  FIELDNAMES, root=args.archive_dir, date=args.reextract_date, workers=args.workers)
+        finish_profiling("tollbrothers")
+        return
+
+    if not args.no_archive:
+        page_archive = PageArchive(args.archive_dir, builder="Toll Brothers")
+    if args.browser_cache:
+        browser_cache = AssetCache(args.browser_cache)
+    if not args.no_session_state:
+        session_state = SessionState(SESSION_STATE_FILE)
+    dead_letters = DeadLetterStore(DEAD_LETTER_FILE)
+    if not args.no_health_check:
+        selector_health = SelectorHealth("Toll Brothers", FIELD_SELECTORS)
+    if args.store:
+        listing_store = ListingStore(args.store)
+
     print(f"{'=' * 80}")
     print(f"开始爬取 Toll Brothers 网站数据")
     print(f"日期: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -620,8 +1012,19 @@ def main():
         # CSV文件名
         output_csv = "tollbrothers_all_homes.csv"
 
-        # 爬取所有州
-        scrape_all_states(output_csv)
+        if args.command == "replay":
+            # 只处理失败的URL，数据追加到上一次爬取的CSV
+            replay_dead_letters(output_csv)
+        elif args.queue:
+            # 队列模式下每个进程写入自己的CSV，避免多进程同时追加同一文件
+            worker_id = args.worker_id or default_worker_id()
+            output_csv = f"tollbrothers_all_homes_{worker_id}.csv"
+            run_queue_worker(args.queue, output_csv, worker_id, args.lease_seconds)
+        else:
+            # 爬取所有州
+            time_budget = parse_duration(args.time_budget) if args.time_budget else None
+            scheduler = CrawlScheduler(STATE_HISTORY_FILE, time_budget=time_budget)
+            scrape_all_states(output_csv, discovery=args.discovery, scheduler=scheduler, replay=not args.no_replay)
 
         print(f"\n{'=' * 80}")
         print(f"爬取任务完成!")
@@ -634,6 +1037,17 @@ def main():
     finally:
         # 确保打印所有错误
         print_global_errors()
+        finish_profiling("tollbrothers")
+        if page_archive:
+            page_archive.close()
+        if browser_cache:
+            browser_cache.report()
+        dead_letters.report()
+        dead_letters.close()
+        if selector_health:
+            selector_health.report()
+        if listing_store:
+            listing_store.close()
 
 
 if __name__ == "__main__":
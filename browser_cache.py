@@ -0,0 +1,149 @@
+import os
+import re
+import json
+import time
+import hashlib
+
+# 默认静态资源缓存目录
+DEFAULT_CACHE_DIR = "browser_cache"
+
+# 只拦截静态资源：JS/CSS/字体/图片（含Next.js的 /_next/static/ 和 /_next/image）
+STATIC_ASSET_PATTERN = re.compile(
+    r"(/_next/static/|/_next/image\?|\.(?:js|mjs|css|woff2?|ttf|otf|png|jpe?g|gif|webp|avif|svg|ico)(?:\?|$))",
+    re.IGNORECASE
+)
+
+# 回放时保留的响应头；body已解压，不能带 content-encoding/content-length
+KEPT_HEADERS = ("content-type", "access-control-allow-origin", "timing-allow-origin")
+
+# 没有 Cache-Control 时的默认有效期(秒)
+DEFAULT_TTL = 24 * 3600
+# immutable 资源（带内容哈希的文件名）的有效期
+IMMUTABLE_TTL = 365 * 24 * 3600
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+def _ttl(cache_control, default_ttl):
+    """根据 Cache-Control 计算有效期；返回 None 表示不可缓存
+
+    缓存不做条件请求重新验证，因此 no-cache（每次使用前都要验证）和
+    private（按用户区分的响应，不能在多个爬虫进程间共享）一律不缓存；
+    must-revalidate 只允许在服务器给出的 max-age 内使用，不套用默认有效期。
+    """
+    cache_control = (cache_control or "").lower()
+    if any(directive in cache_control for directive in ("no-store", "no-cache", "private")):
+        return None
+    if "immutable" in cache_control:
+        return IMMUTABLE_TTL
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        max_age = int(match.group(1))
+        return max_age if max_age > 0 else None
+    if "must-revalidate" in cache_control:
+        return None
+    return default_ttl
+
+
+class AssetCache:
+    """多个浏览器上下文共享的磁盘静态资源缓存
+
+    每个页面都会启动新的浏览器，Chromium自带的磁盘缓存随之丢弃，
+    同一份JS/CSS包会被反复下载。这里通过 context.route 拦截静态资源请求：
+    命中时直接从磁盘回放，未命中时由Playwright代为请求并写入缓存。
+    缓存文件按URL哈希存放并原子替换，多个爬虫进程可以指向同一目录。
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, default_ttl=DEFAULT_TTL):
+        self.root = root
+        self.default_ttl = default_ttl
+        os.makedirs(root, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0  # 不可缓存（非GET、非200、no-store/no-cache/private）的请求
+        self.bytes_saved = 0
+        self.bytes_fetched = 0
+
+    def attach(self, context):
+        """为浏览器上下文启用缓存，需在打开页面前调用"""
+        context.route(STATIC_ASSET_PATTERN, self._handle)
+
+    def _paths(self, url):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        directory = os.path.join(self.root, digest[:2])
+        return directory, os.path.join(directory, digest + ".json"), os.path.join(directory, digest + ".body")
+
+    def _load(self, url):
+        _, meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get("url") != url or time.time() > meta["expires_at"]:
+                return None, None
+            with open(body_path, 'rb') as f:
+                return meta, f.read()
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+    def _store(self, url, headers, body, ttl):
+        directory, meta_path, body_path = self._paths(url)
+        os.makedirs(directory, exist_ok=True)
+        meta = {"url": url, "headers": headers, "expires_at": time.time() + ttl}
+        suffix = f".{os.getpid()}.tmp"
+        # 先写body再写meta，读到meta时body一定完整
+        with open(body_path + suffix, 'wb') as f:
+            f.write(body)
+        os.replace(body_path + suffix, body_path)
+        with open(meta_path + suffix, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + suffix, meta_path)
+
+    def _handle(self, route):
+        request = route.request
+        if request.method != "GET":
+            self.bypassed += 1
+            route.continue_()
+            return
+
+        url = request.url
+        meta, body = self._load(url)
+        if meta is not None:
+            self.hits += 1
+            self.bytes_saved += len(body)
+            route.fulfill(status=200, headers=meta["headers"], body=body)
+            return
+
+        try:
+            response = route.fetch()
+        except Exception:
+            # 请求失败时交还浏览器自行处理
+            self.bypassed += 1
+            try:
+                route.continue_()
+            except Exception:
+                pass
+            return
+
+        body = response.body()
+        ttl = _ttl(response.headers.get("cache-control"), self.default_ttl)
+        if response.status == 200 and ttl is not None:
+            self.misses += 1
+            self.bytes_fetched += len(body)
+            headers = {name: value for name, value in response.headers.items() if name in KEPT_HEADERS}
+            try:
+                self._store(url, headers, body, ttl)
+            except OSError as e:
+                print(f"⚠️ 写入浏览器缓存失败: {url} | {str(e)}")
+        else:
+            self.bypassed += 1
+        route.fulfill(response=response, body=body)
+
+    def report(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0.0
+        print(f"\n{'=' * 80}")
+        print(f"浏览器静态资源缓存 ({self.root})")
+        print(f"命中: {self.hits} | 未命中: {self.misses} | 不可缓存: {self.bypassed} | 命中率: {hit_rate:.1f}%")
+        print(f"节省下载: {self.bytes_saved / 1024 / 1024:.1f} MB | "
+              f"实际下载: {self.bytes_fetched / 1024 / 1024:.1f} MB (按解压后大小统计)")
+        print(f"{'=' * 80}")
@@ -0,0 +1,42 @@
+import time
+
+
+def wait_for_stable_count(count_func, quiet_period=1.0, timeout=30, poll_interval=0.2, baseline=None):
+    """等待列表卡片数量停止增长，返回 (卡片数量, 是否在超时前稳定)
+
+    用于列表页、无限滚动和"加载更多"：不依赖 networkidle（统计/埋点请求常常让它永远等不到），
+    也不固定sleep；数量在 quiet_period 秒内不再变化就立即返回。
+    baseline 不为 None 时先等待数量超过 baseline（例如点击"加载更多"之前的数量），再开始计算静默期。
+    """
+    deadline = time.monotonic() + timeout
+    count = count_func()
+
+    if baseline is not None:
+        while count <= baseline:
+            if time.monotonic() >= deadline:
+                return count, False
+            time.sleep(poll_interval)
+            count = count_func()
+
+    last_change = time.monotonic()
+    while True:
+        now = time.monotonic()
+        if now - last_change >= quiet_period:
+            return count, True
+        if now >= deadline:
+            return count, False
+        time.sleep(poll_interval)
+        current = count_func()
+        if current != count:
+            count = current
+            last_change = time.monotonic()
+
+
+def playwright_counter(page, selector):
+    """Playwright 页面中匹配选择器的元素数量"""
+    return lambda: page.locator(selector).count()
+
+
+def selenium_counter(driver, selector):
+    """Selenium 页面中匹配CSS选择器的元素数量（在浏览器内计数，不返回元素对象）"""
+    return lambda: driver.execute_script("return document.querySelectorAll(arguments[0]).length;", selector)
@@ -0,0 +1,200 @@
+import os
+import sys
+import time
+import datetime
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# 爬虫阶段，按执行顺序排列
+STAGES = ["discovery", "navigation", "wait", "parse", "extract", "write"]
+
+# 全局采样器（未开启 --profile 时为 None）
+_profiler = None
+
+
+class StageProfiler:
+    """按阶段采样 Python 调用栈的轻量级采样分析器"""
+
+    def __init__(self, interval=0.005, top_n=20):
+        self.interval = interval
+        self.top_n = top_n
+        self.samples = defaultdict(Counter)  # 阶段 -> {折叠调用栈: 样本数}
+        self.stage_time = Counter()  # 阶段 -> 累计耗时(秒)，包含嵌套的子阶段
+        self.stage_self_time = Counter()  # 阶段 -> 自身耗时(秒)，扣除嵌套的子阶段
+        self.stage_calls = Counter()  # 阶段 -> 进入次数
+        self._active = {}  # 线程ID -> 当前阶段栈，元素为 [阶段名, 子阶段累计耗时]
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="stage-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    @contextmanager
+    def stage(self, name):
+        """标记当前线程进入某个阶段，嵌套时以最内层阶段为准"""
+        thread_id = threading.get_ident()
+        entry = [name, 0.0]
+        with self._lock:
+            self._active.setdefault(thread_id, []).append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stack = self._active.get(thread_id, [])
+                if stack:
+                    stack.pop()
+                if stack:
+                    # 子阶段的耗时从父阶段的自身耗时中扣除
+                    stack[-1][1] += elapsed
+                else:
+                    self._active.pop(thread_id, None)
+                # 累计耗时只统计同名阶段的最外层，避免递归嵌套重复计时
+                if all(active_name != name for active_name, _ in stack):
+                    self.stage_time[name] += elapsed
+                self.stage_self_time[name] += elapsed - entry[1]
+                self.stage_calls[name] += 1
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                active = {tid: stack[-1][0] for tid, stack in self._active.items() if stack}
+            for thread_id, stage_name in active.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                self.samples[stage_name][_fold_stack(frame)] += 1
+
+    def write_reports(self, output_dir, top_n=20):
+        """写出火焰图折叠栈文件和热点汇总"""
+        os.makedirs(output_dir, exist_ok=True)
+
+        # 所有阶段合并的折叠栈，以阶段名作为根帧
+        with open(os.path.join(output_dir, "all_stages.folded"), 'w', encoding='utf-8') as f:
+            for stage_name, stacks in self.samples.items():
+                for stack, count in stacks.items():
+                    f.write(f"{stage_name};{stack} {count}\n")
+
+        # 每个阶段单独的折叠栈
+        for stage_name, stacks in self.samples.items():
+            with open(os.path.join(output_dir, f"{stage_name}.folded"), 'w', encoding='utf-8') as f:
+                for stack, count in stacks.items():
+                    f.write(f"{stack} {count}\n")
+
+        summary_path = os.path.join(output_dir, "hotspots.txt")
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(self.format_summary(top_n))
+        return summary_path
+
+    def format_summary(self, top_n=20):
+        lines = []
+        total_elapsed = time.time() - self.started_at if self.started_at else 0
+        lines.append(f"总耗时: {total_elapsed:.2f}秒  采样间隔: {self.interval * 1000:.1f}ms")
+        lines.append("")
+        # 阶段可以嵌套（如 extract 内部的 wait），累计耗时互相重叠，自身耗时之和才等于总计时
+        lines.append("累计耗时包含嵌套的子阶段，自身耗时扣除子阶段，各阶段自身耗时之和不重复计时")
+        lines.append(f"{'阶段':<12}{'次数':>8}{'累计耗时(秒)':>14}{'自身耗时(秒)':>14}{'样本数':>10}")
+        ordered = STAGES + sorted(set(self.stage_time) - set(STAGES))
+        for stage_name in ordered:
+            if stage_name not in self.stage_calls:
+                continue
+            sample_count = sum(self.samples[stage_name].values())
+            lines.append(f"{stage_name:<12}{self.stage_calls[stage_name]:>8}"
+                         f"{self.stage_time[stage_name]:>14.2f}{self.stage_self_time[stage_name]:>14.2f}"
+                         f"{sample_count:>10}")
+        lines.append(f"{'合计':<12}{sum(self.stage_calls.values()):>8}{'':>14}"
+                     f"{sum(self.stage_self_time.values()):>14.2f}")
+
+        for stage_name in ordered:
+            stacks = self.samples.get(stage_name)
+            if not stacks:
+                continue
+            total = sum(stacks.values())
+            self_counts = Counter()
+            inclusive_counts = Counter()
+            for stack, count in stacks.items():
+                funcs = stack.split(';')
+                self_counts[funcs[-1]] += count
+                # 递归函数在一条栈中只计一次
+                for func in set(funcs):
+                    inclusive_counts[func] += count
+
+            lines.append("")
+            lines.append(f"{'=' * 80}")
+            lines.append(f"阶段 {stage_name} 热点 (共 {total} 个样本)")
+            lines.append(f"{'=' * 80}")
+            lines.append("自身耗时:")
+            for func, count in self_counts.most_common(top_n):
+                lines.append(f"  {count / total * 100:6.2f}%  {func}")
+            lines.append("累计耗时:")
+            for func, count in inclusive_counts.most_common(top_n):
+                lines.append(f"  {count / total * 100:6.2f}%  {func}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _fold_stack(frame):
+    """把帧链转换成 flamegraph.pl / speedscope 可读的折叠格式（根在前）"""
+    funcs = []
+    while frame is not None:
+        code = frame.f_code
+        funcs.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    funcs.reverse()
+    return ";".join(funcs)
+
+
+def enable_profiling(interval=0.005, top_n=20):
+    """开启全局采样分析"""
+    global _profiler
+    _profiler = StageProfiler(interval=interval, top_n=top_n)
+    _profiler.start()
+    print(f"🔬 已开启性能分析模式 (采样间隔 {interval * 1000:.1f}ms)")
+    return _profiler
+
+
+def profile_stage(name):
+    """阶段标记；未开启分析时不产生任何开销"""
+    if _profiler is None:
+        return _null_stage()
+    return _profiler.stage(name)
+
+
+@contextmanager
+def _null_stage():
+    yield
+
+
+def finish_profiling(prefix="crawler"):
+    """停止采样并写出报告，返回报告目录"""
+    global _profiler
+    if _profiler is None:
+        return None
+
+    profiler = _profiler
+    _profiler = None
+    profiler.stop()
+    top_n = profiler.top_n
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_dir = f"{prefix}_profile_{timestamp}"
+    summary_path = profiler.write_reports(output_dir, top_n=top_n)
+
+    print(f"\n{'=' * 80}")
+    print(profiler.format_summary(top_n=min(top_n, 10)))
+    print(f"🔬 火焰图折叠栈已保存到: {output_dir}/*.folded")
+    print(f"🔬 热点汇总已保存到: {summary_path}")
+    print(f"{'=' * 80}")
+    return output_dir
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import zlib
+import random
+import datetime
+
+# 没有历史数据时对单个市场耗时的估计(秒)
+DEFAULT_DURATION = 600
+# 变化率的指数平滑系数
+CHANGE_RATE_ALPHA = 0.5
+
+
+def parse_duration(text):
+    """解析时长参数，如 "5400"、"90m"、"2h"、"1.5h"，返回秒数"""
+    text = str(text).strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def link_digest(link):
+    # 只保存链接的CRC32，历史文件保持紧凑
+    return format(zlib.crc32(link.encode('utf-8')), '08x')
+
+
+def _link_digests(links):
+    return sorted({link_digest(link) for link in links})
+
+
+class CrawlScheduler:
+    """按历史数据为市场排序并在时间预算内安排爬取
+
+    历史记录每个市场的房源数、变化率(相邻两次的链接差异占比)、耗时和最近成功时间，
+    优先级 = 预计新鲜房源数 / 预计耗时，即单位时间内能拿到的新变化最多的市场优先。
+    """
+
+    def __init__(self, history_path, time_budget=None):
+        self.history_path = history_path
+        self.time_budget = time_budget
+        self.started_at = time.time()
+        self.history = {}
+        self.deferred = []  # (市场, 原因)
+        self.deferred_parts = {}  # 市场 -> 中途推迟时未爬取的子页面(如社区)
+        self._crawled = {}  # 市场 -> 中途推迟前已爬取的链接摘要
+        self.completed = []
+        self._planned = []
+        if os.path.exists(history_path):
+            try:
+                with open(history_path, 'r', encoding='utf-8') as f:
+                    self.history = json.load(f)
+            except Exception as e:
+                print(f"⚠️ 读取爬取历史失败，按默认顺序爬取: {str(e)}")
+
+    def estimated_duration(self, key):
+        entry = self.history.get(key)
+        if entry and entry.get("duration"):
+            return entry["duration"]
+        return DEFAULT_DURATION
+
+    def priority(self, key):
+        entry = self.history.get(key)
+        if not entry or not entry.get("last_success"):
+            # 从未成功爬取过的市场最优先
+            return float("inf")
+        listings = entry.get("listings", 0)
+        change_rate = entry.get("change_rate", 1.0)
+        hours_since = (time.time() - entry["last_success"]) / 3600
+        # 越久没有成功爬取，积累的未知变化越多
+        staleness = min(hours_since / (24 * 7), 1.0)
+        expected_fresh = listings * change_rate + listings * staleness * 0.1 + 1
+        return expected_fresh / max(self.estimated_duration(key), 60)
+
+    def order(self, keys):
+        """有时间预算时按优先级排序，否则保持原顺序"""
+        keys = list(keys)
+        if self.time_budget:
+            keys.sort(key=self.priority, reverse=True)
+        self._planned = keys
+        return keys
+
+    def remaining(self):
+        if not self.time_budget:
+            return float("inf")
+        return self.time_budget - (time.time() - self.started_at)
+
+    def should_start(self, key):
+        """预计耗时超出剩余预算时推迟该市场，继续尝试后面更短的市场"""
+        if not self.time_budget:
+            return True
+        remaining = self.remaining()
+        estimate = self.estimated_duration(key)
+        if remaining <= 0:
+            self.deferred.append((key, "时间预算已用完"))
+            return False
+        if estimate > remaining:
+            self.deferred.append((key, f"预计耗时 {estimate / 60:.1f} 分钟，剩余 {remaining / 60:.1f} 分钟"))
+            return False
+        return True
+
+    def has_time_for(self, estimate):
+        """剩余预算是否还够再爬一个预计耗时为 estimate 秒的子页面"""
+        if not self.time_budget:
+            return True
+        return estimate < self.remaining()
+
+    def defer(self, key, reason, parts=(), crawled_links=()):
+        """市场已开始但预算不足时推迟其余部分：parts 为未爬取的子页面，crawled_links 为已爬取的链接"""
+        self.deferred.append((key, reason))
+        self.deferred_parts[key] = list(parts)
+        self._crawled[key] = set(_link_digests(crawled_links))
+
+    def is_deferred(self, key):
+        return any(deferred_key == key for deferred_key, _ in self.deferred)
+
+    def under_pressure(self):
+        """剩余计划的预计耗时超过剩余预算"""
+        if not self.time_budget:
+            return False
+        done = set(self.completed) | {key for key, _ in self.deferred}
+        pending = sum(self.estimated_duration(key) for key in self._planned if key not in done)
+        return pending > self.remaining()
+
+    def deferred_links(self):
+        """被推迟的市场上次成功爬取时的链接摘要；这些房源本次没有爬取，不能当作下架"""
+        digests = set()
+        for key, _ in self.deferred:
+            # 中途推迟的市场只沿用本次没有爬到的链接
+            crawled = self._crawled.get(key, set())
+            digests.update(link for link in self.history.get(key, {}).get("links", []) if link not in crawled)
+        return digests
+
+    def pause(self, low, high):
+        """请求间隔；时间紧张时只取下限"""
+        time.sleep(low if self.under_pressure() else random.uniform(low, high))
+
+    def record(self, key, links, duration, success=True):
+        """记录一个市场的爬取结果并更新变化率"""
+        entry = self.history.setdefault(key, {})
+        entry["duration"] = round(duration, 1)
+        if success:
+            digests = _link_digests(links)
+            previous = set(entry.get("links", []))
+            if previous:
+                churn = len(previous.symmetric_difference(digests)) / len(previous)
+                entry["change_rate"] = round(CHANGE_RATE_ALPHA * churn +
+                                             (1 - CHANGE_RATE_ALPHA) * entry.get("change_rate", churn), 4)
+            entry["listings"] = len(digests)
+            entry["last_success"] = time.time()
+            entry["links"] = digests
+        self.completed.append(key)
+        self.save()
+
+    def save(self):
+        tmp_path = self.history_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.history, f, ensure_ascii=False)
+        os.replace(tmp_path, self.history_path)
+
+    def report(self):
+        elapsed = time.time() - self.started_at
+        print(f"\n{'=' * 80}")
+        budget_text = f"{self.time_budget / 60:.1f} 分钟" if self.time_budget else "不限"
+        print(f"调度报告: 时间预算 {budget_text}，实际用时 {elapsed / 60:.1f} 分钟")
+        print(f"已完成市场: {len(self.completed)}")
+        if self.deferred:
+            print(f"推迟的市场 ({len(self.deferred)} 个):")
+            for key, reason in self.deferred:
+                last = self.history.get(key, {}).get("last_success")
+                last_text = datetime.datetime.fromtimestamp(last).strftime('%Y-%m-%d %H:%M') if last else "从未"
+                print(f"  - {key}: {reason} (上次成功: {last_text})")
+                for part in self.deferred_parts.get(key, []):
+                    print(f"      · {part}")
+        else:
+            print("没有推迟的市场")
+        print(f"{'=' * 80}")
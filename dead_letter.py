@@ -0,0 +1,128 @@
+import time
+import random
+import sqlite3
+import datetime
+
+# 同一URL累计失败达到该次数后不再重放，只在报告中列出
+MAX_REPLAY_ATTEMPTS = 5
+
+# 空结果（页面打开了但没找到卡片等）的错误类别
+EMPTY_RESULT = "EmptyResult"
+
+
+class DeadLetterStore:
+    """失败URL的持久化记录（死信）
+
+    记录 URL、阶段(state/community/market/property)、错误类别和累计失败次数。
+    同一个URL在同一阶段只保留一条，之后任何一次成功都会把它移除；
+    运行结束时或通过 replay 命令，只重试这些URL，不必整站重新爬取。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                url TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                error_class TEXT NOT NULL,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                first_failed TEXT NOT NULL,
+                last_failed TEXT NOT NULL,
+                PRIMARY KEY (url, stage)
+            )
+        """)
+
+    def record(self, url, stage, error, error_class=None):
+        """记录一次失败；error 为异常对象或错误描述，描述未指定类别时按空结果处理"""
+        if isinstance(error, BaseException):
+            error_class, message = type(error).__name__, str(error)
+        else:
+            error_class, message = error_class or EMPTY_RESULT, str(error)
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        try:
+            self.conn.execute("""
+                INSERT INTO dead_letters (url, stage, error_class, error, attempts, first_failed, last_failed)
+                VALUES (?, ?, ?, ?, 1, ?, ?)
+                ON CONFLICT (url, stage) DO UPDATE SET
+                    error_class = excluded.error_class, error = excluded.error,
+                    attempts = attempts + 1, last_failed = excluded.last_failed
+            """, (url, stage, error_class, message[:500], now, now))
+        except sqlite3.Error as e:
+            print(f"⚠️ 记录失败URL出错: {url} | {str(e)}")
+
+    def resolve(self, url, stage):
+        """URL已成功处理，从死信中移除"""
+        try:
+            self.conn.execute("DELETE FROM dead_letters WHERE url = ? AND stage = ?", (url, stage))
+        except sqlite3.Error as e:
+            print(f"⚠️ 移除失败URL记录出错: {url} | {str(e)}")
+
+    def _exists(self, url, stage):
+        return self.conn.execute("SELECT 1 FROM dead_letters WHERE url = ? AND stage = ?",
+                                 (url, stage)).fetchone() is not None
+
+    def pending(self, max_attempts=MAX_REPLAY_ATTEMPTS):
+        """待重放的死信，按阶段从大到小(州/市场 -> 社区 -> 房源)、失败次数从少到多排列"""
+        return self.conn.execute(
+            "SELECT url, stage, error_class, attempts FROM dead_letters WHERE attempts < ? "
+            "ORDER BY CASE stage WHEN 'property' THEN 1 ELSE 0 END, attempts, first_failed",
+            (max_attempts,)
+        ).fetchall()
+
+    def replay(self, handlers, max_attempts=MAX_REPLAY_ATTEMPTS, delay=(5, 10)):
+        """逐个重放死信，返回(成功数, 失败数)
+
+        handlers 为 {阶段: 处理函数(url)}，返回真值表示成功。爬取函数失败时会自行记录死信，
+        这里只在处理函数抛出异常时记录，避免同一次失败被计数两次。
+        重放串行进行，且每个URL之间比正常爬取停顿更久，降低再次被限流的概率。
+        """
+        letters = [letter for letter in self.pending(max_attempts) if letter[1] in handlers]
+        if not letters:
+            return 0, 0
+
+        print(f"\n{'=' * 80}")
+        print(f"开始重放失败URL: {len(letters)} 个")
+        print(f"{'=' * 80}")
+        succeeded = failed = 0
+        for i, (url, stage, error_class, attempts) in enumerate(letters, 1):
+            if not self._exists(url, stage):
+                # 已在重放上一级页面(州/社区)时顺带成功
+                succeeded += 1
+                continue
+            print(f"\n🔁 重放 ({i}/{len(letters)}) [{stage}] {url} (上次错误: {error_class}，已失败 {attempts} 次)")
+            try:
+                ok = handlers[stage](url)
+            except Exception as e:
+                print(f"❌ 重放出错: {str(e)}")
+                self.record(url, stage, e)
+                ok = False
+            if ok:
+                self.resolve(url, stage)
+                succeeded += 1
+            else:
+                failed += 1
+            if i < len(letters):
+                time.sleep(random.uniform(*delay))
+        return succeeded, failed
+
+    def report(self):
+        rows = self.conn.execute(
+            "SELECT stage, error_class, COUNT(*), SUM(attempts >= ?) FROM dead_letters "
+            "GROUP BY stage, error_class ORDER BY COUNT(*) DESC",
+            (MAX_REPLAY_ATTEMPTS,)
+        ).fetchall()
+        print(f"\n{'=' * 80}")
+        if not rows:
+            print("✅ 没有未解决的失败URL")
+        else:
+            print(f"未解决的失败URL ({self.path}):")
+            for stage, error_class, count, exhausted in rows:
+                print(f"  - [{stage}] {error_class}: {count} 个 (其中 {exhausted or 0} 个已达重放上限)")
+        print(f"{'=' * 80}")
+
+    def close(self):
+        self.conn.close()
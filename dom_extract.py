@@ -0,0 +1,76 @@
+# 在浏览器内按规格一次性提取所有卡片字段的脚本
+# 规格: {"item": 卡片选择器, "fields": {字段名: {"selector": [备选选择器...], "attr": "text"|属性名, "multiple": bool}}}
+_EXTRACT_JS = """
+(spec) => {
+    const normalize = (text) => (text || "").replace(/\\s+/g, " ").trim();
+    // Playwright 风格的 text="..." 选择器：文本完全相同的最内层元素
+    const matchText = (root, selector) => {
+        const text = selector.slice(5).replace(/^"(.*)"$/, "$1");
+        return Array.from(root.querySelectorAll("*")).filter((el) =>
+            normalize(el.textContent) === text &&
+            !Array.from(el.children).some((child) => normalize(child.textContent) === text));
+    };
+    const find = (root, selectors, multiple) => {
+        if (!selectors || !selectors.length) {
+            return multiple ? [root] : root;
+        }
+        // 按顺序尝试备选选择器，取第一个有结果的
+        for (const selector of selectors) {
+            if (selector.startsWith("text=")) {
+                const found = matchText(root, selector);
+                if (found.length) return multiple ? found : found[0];
+            } else if (multiple) {
+                const found = root.querySelectorAll(selector);
+                if (found.length) return Array.from(found);
+            } else {
+                const found = root.querySelector(selector);
+                if (found) return found;
+            }
+        }
+        return multiple ? [] : null;
+    };
+    const read = (el, attr) => {
+        if (!el) return null;
+        if (attr === "text") return normalize(el.textContent);
+        return el.getAttribute(attr);
+    };
+    const items = spec.item ? Array.from(document.querySelectorAll(spec.item)) : [document];
+    return items.map((item) => {
+        const row = {};
+        for (const [name, field] of Object.entries(spec.fields)) {
+            const found = find(item, field.selector, field.multiple);
+            row[name] = field.multiple ? found.map((el) => read(el, field.attr)) : read(found, field.attr);
+        }
+        return row;
+    });
+}
+"""
+
+
+def field(selector=None, attr="text", multiple=False):
+    """字段规格：selector 为CSS选择器或备选选择器列表（None 表示卡片元素本身），
+    也支持 Playwright 的 text="..." 写法（文本完全相同的最内层元素）；
+    attr 为 "text"（去除多余空白的文本）或属性名，multiple=True 时返回所有匹配元素的值列表"""
+    if isinstance(selector, str):
+        selector = [selector]
+    return {"selector": list(selector or []), "attr": attr, "multiple": multiple}
+
+
+def _spec(item, fields):
+    return {"item": item, "fields": {name: spec if isinstance(spec, dict) else field(spec)
+                                     for name, spec in fields.items()}}
+
+
+def extract_cards(page, item, fields):
+    """Playwright：一次 page.evaluate 提取所有卡片的字段，返回字典列表
+
+    代替逐个元素调用 query_selector/get_attribute/text_content，
+    每次调用都是一次浏览器往返，卡片多、备选选择器多时往返次数成百上千。
+    item 为 None 时把整个页面当作一张卡片。
+    """
+    return page.evaluate(_EXTRACT_JS, _spec(item, fields))
+
+
+def extract_cards_selenium(driver, item, fields):
+    """Selenium 版本，规格和返回值与 extract_cards 相同"""
+    return driver.execute_script(f"return ({_EXTRACT_JS})(arguments[0]);", _spec(item, fields))
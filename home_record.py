@@ -0,0 +1,157 @@
+import re
+
+# CSV字段顺序（所有建筑商统一）
+FIELDNAMES = [
+    "date_scraped", "builder", "brand", "community", "address", "city",
+    "state", "zip", "plan_type", "plan", "floors", "bedrooms",
+    "full_bathrooms", "half_bathrooms", "garage", "sqft", "price",
+    "home_id", "status", "link"
+]
+
+# 数值字段及其类型
+INT_FIELDS = ("price", "sqft", "bedrooms", "full_bathrooms", "half_bathrooms")
+FLOAT_FIELDS = ("garage", "floors")
+
+_NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?')
+_ZIP = re.compile(r'\b(\d{5})(?:-\d{4})?\b')
+
+
+class HomeRecord:
+    """一条房源记录：文本字段为str，数值字段为int/float，缺失为None"""
+
+    __slots__ = tuple(FIELDNAMES)
+
+    def __init__(self, **fields):
+        for name in FIELDNAMES:
+            setattr(self, name, fields.get(name))
+
+    def to_row(self):
+        """转换为写CSV用的字符串字典"""
+        return {name: _format(getattr(self, name)) for name in FIELDNAMES}
+
+    def __repr__(self):
+        return f"HomeRecord(builder={self.builder!r}, link={self.link!r}, price={self.price!r})"
+
+
+def _format(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        # 2.0 -> "2"，2.5 -> "2.5"
+        return str(int(value)) if value.is_integer() else str(value)
+    return str(value)
+
+
+def _parse_number(text):
+    """取文本中的第一个数字，如 "$499,990"、"From $400,000 - $450,000"、"2 Car" """
+    match = _NUMBER.search(text)
+    if not match:
+        return None
+    return float(match.group().replace(',', ''))
+
+
+def _normalize_column(values, convert):
+    """按列批量转换：同一批次中重复的原始值（如 "3"、"2.5"）只解析一次"""
+    cache = {}
+    result = []
+    for value in values:
+        if value is None or value == "":
+            result.append(None)
+            continue
+        if value not in cache:
+            cache[value] = convert(str(value).strip())
+        result.append(cache[value])
+    return result
+
+
+def _to_int(text):
+    number = _parse_number(text)
+    return int(number) if number is not None else None
+
+
+def _to_zip(text):
+    match = _ZIP.search(text)
+    return match.group(1) if match else None
+
+
+# 需要转换的字段及其转换函数，其余为文本字段
+_CONVERTERS = {
+    "price": _to_int, "sqft": _to_int, "bedrooms": _to_int,
+    "full_bathrooms": _parse_number, "half_bathrooms": _parse_number,
+    "garage": _parse_number, "floors": _parse_number,
+    "zip": _to_zip,
+}
+
+
+def _split_baths(full, half):
+    """浴室数为 "2.5" 这类小数且未单独给出半卫时，拆成 2 个全卫 + 1 个半卫"""
+    if full is not None and not full.is_integer():
+        if half is None:
+            half = 1
+        full = int(full)
+    return (int(full) if full is not None else None,
+            int(half) if half is not None else None)
+
+
+def normalize_batch(rows):
+    """把各建筑商提取器返回的原始字符串字典批量转换为HomeRecord
+
+    按列处理而不是逐行处理，所有建筑商共用同一套数值规则：
+    - 价格、面积、卧室等取第一个数字（区间取下限）
+    - 浴室数为 "2.5" 这类小数且未单独给出半卫时，拆成 2 个全卫 + 1 个半卫
+    - 邮编只保留5位数字
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    columns = {name: [row.get(name) for row in rows] for name in FIELDNAMES}
+
+    for name in FIELDNAMES:
+        convert = _CONVERTERS.get(name)
+        if convert is None:
+            columns[name] = [value.strip() if isinstance(value, str) else (value or "") for value in columns[name]]
+        else:
+            columns[name] = _normalize_column(columns[name], convert)
+
+    baths = [_split_baths(full, half) for full, half in zip(columns["full_bathrooms"], columns["half_bathrooms"])]
+    columns["full_bathrooms"] = [full for full, _ in baths]
+    columns["half_bathrooms"] = [half for _, half in baths]
+
+    records = []
+    for i in range(len(rows)):
+        record = HomeRecord.__new__(HomeRecord)
+        for name in FIELDNAMES:
+            setattr(record, name, columns[name][i])
+        records.append(record)
+    return records
+
+
+def normalize_rows(rows):
+    """批量标准化并直接返回写CSV用的字符串字典"""
+    return [record.to_row() for record in normalize_batch(rows)]
+
+
+def normalize_row(row):
+    """单行标准化，用于逐行写入的场景
+
+    爬虫每爬完一套房源就追加写入一行，进程中途退出时已爬的数据不会丢失，
+    因此这里不攒批，而是直接按字段转换成一个字符串字典：
+    不经过按列的中间列表和HomeRecord对象，单行只分配结果字典本身。
+    转换规则与 normalize_batch 相同，只是少了批次内重复值的解析缓存。
+    """
+    values = {}
+    for name in FIELDNAMES:
+        value = row.get(name)
+        convert = _CONVERTERS.get(name)
+        if convert is None:
+            values[name] = value.strip() if isinstance(value, str) else (value or "")
+        elif value is None or value == "":
+            values[name] = None
+        else:
+            values[name] = convert(str(value).strip())
+    values["full_bathrooms"], values["half_bathrooms"] = _split_baths(values["full_bathrooms"],
+                                                                      values["half_bathrooms"])
+    for name in FIELDNAMES:
+        values[name] = _format(values[name])
+    return values
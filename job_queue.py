@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+import traceback
+
+# 任务状态
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """基于SQLite的持久化任务队列，支持租约、心跳和可见性超时
+
+    多个爬虫进程（同一台机器或共享文件系统的多台机器）指向同一个数据库文件即可
+    共同完成一次爬取。进程崩溃后，其租约到期的任务会自动回到队列中被其他进程领取。
+    注意：网络文件系统上需要支持POSIX文件锁，SQLite才能保证互斥。
+    """
+
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=60000")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                job_key TEXT NOT NULL,
+                payload TEXT,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (kind, job_key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority, id)")
+
+    def enqueue(self, kind, job_key, payload=None, priority=0):
+        """添加任务；同一(kind, job_key)只会入队一次，返回是否为新任务"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT OR IGNORE INTO jobs (kind, job_key, payload, priority, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, job_key, json.dumps(payload, ensure_ascii=False), priority, now, now)
+        )
+        return cursor.rowcount > 0
+
+    def enqueue_many(self, kind, jobs, priority=0):
+        """批量添加任务，jobs为(job_key, payload)列表，返回新增数量"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (kind, job_key, payload, priority, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(kind, key, json.dumps(payload, ensure_ascii=False), priority, now, now)
+                 for key, payload in jobs]
+            )
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+            return added
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def claim(self, worker_id, kinds=None):
+        """领取一个待处理或租约已过期的任务，返回任务字典或None"""
+        now = time.time()
+        conn = self._conn()
+        kind_filter = ""
+        params = [PENDING, LEASED, now]
+        if kinds:
+            kind_filter = f" AND kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 租约过期且尝试次数已用完的任务（如每次都让进程崩溃）不再领取，直接标记为失败
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_expires = NULL, "
+                "last_error = '租约过期，已达到最大尝试次数', updated_at = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT id, kind, job_key, payload, attempts FROM jobs "
+                "WHERE (status = ? OR (status = ? AND lease_expires < ?))" + kind_filter +
+                " ORDER BY priority DESC, id LIMIT 1",
+                params
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            job_id, kind, job_key, payload, attempts = row
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                (LEASED, worker_id, now + self.lease_seconds, now, job_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return {
+            "id": job_id,
+            "kind": kind,
+            "key": job_key,
+            "payload": json.loads(payload) if payload else None,
+            "attempts": attempts + 1,
+        }
+
+    def heartbeat(self, job_id, worker_id):
+        """续租；返回False表示租约已丢失（已过期并被其他进程领取）"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+            "WHERE id = ? AND worker_id = ? AND status = ?",
+            (now + self.lease_seconds, now, job_id, worker_id, LEASED)
+        )
+        return cursor.rowcount > 0
+
+    def complete(self, job_id, worker_id):
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = ?, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND worker_id = ? AND status = ?",
+            (DONE, now, job_id, worker_id, LEASED)
+        )
+        return cursor.rowcount > 0
+
+    def fail(self, job_id, worker_id, error):
+        """任务失败：未达到最大尝试次数时放回队列，否则标记为失败"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+            "lease_expires = NULL, last_error = ?, updated_at = ? "
+            "WHERE id = ? AND worker_id = ? AND status = ?",
+            (self.max_attempts, FAILED, PENDING, str(error)[:2000], now, job_id, worker_id, LEASED)
+        )
+        return cursor.rowcount > 0
+
+    def counts(self):
+        """按状态统计任务数量"""
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class LeaseHeartbeat:
+    """处理任务期间在后台线程中定期续租"""
+
+    def __init__(self, queue, job_id, worker_id, interval=None):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval or max(queue.lease_seconds / 3, 1)
+        self.lost = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stop_event.wait(self.interval):
+                try:
+                    if not self.queue.heartbeat(self.job_id, self.worker_id):
+                        self.lost = True
+                        return
+                except sqlite3.Error as e:
+                    print(f"⚠️ 续租失败: {str(e)}")
+        finally:
+            # 关闭心跳线程自己的连接
+            self.queue.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop_event.set()
+        self._thread.join(timeout=5)
+        return False
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_worker(queue, worker_id, handlers, poll_interval=5, idle_exit_after=60, should_stop=None):
+    """循环领取并处理任务，直到队列中没有待处理或进行中的任务
+
+    handlers: {kind: handler(payload)}，handler抛出异常视为失败，其余视为成功。
+    should_stop: 可选的无参函数，返回真值时不再领取新任务（如选择器已失效）。
+    其他进程仍有进行中的任务时继续等待，因为它们可能产生新任务或租约过期后重新入队。
+    """
+    processed = 0
+    idle_since = None
+
+    while True:
+        if should_stop and should_stop():
+            print(f"\n⛔ [{worker_id}] 停止领取新任务")
+            break
+        job = queue.claim(worker_id, kinds=list(handlers))
+        if job is None:
+            counts = queue.counts()
+            if counts[LEASED] == 0 and counts[PENDING] == 0:
+                print(f"\n✅ 队列已处理完毕 (完成 {counts[DONE]} / 失败 {counts[FAILED]})")
+                break
+            idle_since = idle_since or time.time()
+            if counts[LEASED] == 0 and time.time() - idle_since > idle_exit_after:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        idle_since = None
+        print(f"\n📥 [{worker_id}] 领取任务 {job['kind']}: {job['key']} (第 {job['attempts']} 次尝试)")
+        try:
+            with LeaseHeartbeat(queue, job["id"], worker_id) as heartbeat:
+                handlers[job["kind"]](job["payload"])
+            if heartbeat.lost:
+                print(f"⚠️ 任务租约已丢失，结果可能重复: {job['key']}")
+            else:
+                queue.complete(job["id"], worker_id)
+            processed += 1
+        except Exception as e:
+            print(f"❌ 任务失败 {job['kind']}: {job['key']} | {str(e)}")
+            traceback.print_exc()
+            queue.fail(job["id"], worker_id, f"{type(e).__name__}: {str(e)}")
+
+    return processed
@@ -5,11 +5,102 @@ import time
 import random
 import requests
 from datetime import datetime
+from urllib.parse import urlparse, parse_qs
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
+import argparse
+
+from crawl_profiler import enable_profiling, profile_stage, finish_profiling
+from job_queue import JobQueue, run_worker, default_worker_id
+from snapshot_diff import diff_snapshots, print_diff_summary, previous_date
+from sitemap_discovery import discover_urls, LastmodStore, load_previous_rows
+from page_archive import PageArchive, reextract, DEFAULT_ARCHIVE_DIR
+from home_record import FIELDNAMES, normalize_row
+from crawl_scheduler import CrawlScheduler, parse_duration, link_digest
+from session_state import SessionState, CONSENT_COOKIE
+from content_wait import wait_for_stable_count, selenium_counter
+from dom_extract import extract_cards_selenium, field
+from dead_letter import DeadLetterStore
+from plan_cache import PlanCache
+from selector_health import SelectorHealth
+from listing_store import ListingStore, DEFAULT_STORE_PATH
+
+# 站点地图发现模式
+SITEMAP_URLS = ["https://www.lennar.com/sitemap.xml"]
+# 房源页面: /new-homes/{州}/{城市}/.../{房源}
+SITEMAP_PROPERTY_PATTERNS = [
+    r"^https://www\.lennar\.com/new-homes/[^/]+/[^/]+/[^/]+/[^/]+/[^/]+/?$",
+]
+SITEMAP_LASTMOD_FILE = "lennar_sitemap_lastmod.json"
+
+# 各市场爬取历史（房源数、变化率、耗时），用于时间预算内的优先级排序
+MARKET_HISTORY_FILE = "lennar_market_history.json"
+
+# 原始页面归档（--no-archive 时为 None）
+page_archive = None
+
+# 持久化的Cookie（含Cookie弹窗的同意状态），每个driver启动时预置
+SESSION_STATE_FILE = "lennar_session_state.json"
+session_state = None  # --no-session-state 时为 None
+
+# 失败URL的持久化记录，运行结束时和 replay 命令只重试这些URL
+DEAD_LETTER_FILE = "lennar_dead_letters.sqlite"
+dead_letters = None
+
+# 户型级属性缓存（卧室/浴室/车库/面积/层数），--no-plan-cache 时为 None
+PLAN_CACHE_FILE = "lennar_plan_cache.sqlite"
+plan_cache = None
+
+# 选择器健康检查：详情页上通常都有值的字段及其选择器
+FIELD_SELECTORS = {
+    "community": 'a[data-testid="sidebar-community-url"] span',
+    "address": '.HomesiteDetailsInfoV2_supplementalAddressWrapper__k0gEc p:nth-of-type(2)',
+    "bedrooms": '.HomesiteDetailsInfoV2_supplementalAddressWrapper__k0gEc p:nth-of-type(1)',
+    "sqft": '.HomesiteDetailsInfoV2_supplementalAddressWrapper__k0gEc p:nth-of-type(1)',
+    "price": '#sidebar-price',
+    "status": '#homesite-status',
+    "plan": '.TextButton_textbutton__bkUsl span.textLinkLargeNew',
+}
+HOMESITE_CARD_SELECTOR = 'a.HomesiteCard_link__CyDpK[href]'
+selector_health = None  # --no-health-check 时为 None
+
+
+# 房源数据库（当前表 + 价格/状态历史），未指定 --store 时为 None
+listing_store = None
+
+# 本次运行的日期，启动时确定；CSV按 date_scraped 划分快照，
+# 跨过午夜的长时间运行写入的所有行都使用这个日期，同一次运行不会被拆成两个快照
+run_date = None
+
+
+# 选择器健康检查未通过时返回 True，各爬取循环据此立即停止
+def selectors_broken():
+    return bool(selector_health and selector_health.tripped)
+
+
+# 写入一条房源：CSV立即落盘，数据库批量写入
+def write_property(writer, csvfile, property_data):
+    if run_date:
+        property_data['date_scraped'] = run_date
+    with profile_stage("write"):
+        writer.writerow(normalize_row(property_data))
+        csvfile.flush()  # 立即写入磁盘
+        if listing_store:
+            listing_store.add(property_data)
+
+
+# 记录失败的URL（stage: market/property）
+def dead_letter(stage, url, error):
+    if dead_letters:
+        dead_letters.record(url, stage, error)
+
+
+def resolve_dead_letter(stage, url):
+    if dead_letters:
+        dead_letters.resolve(url, stage)
 
 # 州与市场对应关系
 STATE_MARKETS = {
@@ -66,53 +157,70 @@ def setup_driver():
 
     driver = webdriver.Chrome(options=options)
     driver.set_page_load_timeout(120)
+    if session_state:
+        session_state.seed_selenium(driver)
     return driver
 
 
-#市场页面获取所有房源链接
+#市场页面网址结构
+def market_url(state_code, market_code):
+    return f"https://www.lennar.com/find-a-home?state={state_code}&market={market_code}"
+
+
+#市场页面获取所有房源链接；页面没有打开时返回 None，与打开后没有卡片（空列表）区分
 def get_links_for_market(driver, state_code, market_code):
     base_url = "https://www.lennar.com"
-    #网址结构
-    url = f"{base_url}/find-a-home?state={state_code}&market={market_code}"
+    url = market_url(state_code, market_code)
 
     print(f"正在访问市场页面: {url}")
 
     try:
-        driver.get(url)
+        with profile_stage("navigation"):
+            driver.get(url)
     except Exception as e:
         print(f"  页面加载超时: {str(e)}")
-        return []
+        return None
 
-    # 处理Cookie弹窗
-    try:
-        accept_button = WebDriverWait(driver, 15).until(
-            EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler")))
-        accept_button.click()
-        print("  已接受Cookie政策")
-        time.sleep(1)
-    except Exception as e:
-        print(f"  未找到Cookie弹窗: {str(e)}")
+    # 处理Cookie弹窗；已预置同意Cookie时弹窗不会出现，无需等待
+    if not (session_state and session_state.has_cookie(CONSENT_COOKIE)):
+        try:
+            with profile_stage("wait"):
+                accept_button = WebDriverWait(driver, 15).until(
+                    EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler")))
+            accept_button.click()
+            print("  已接受Cookie政策")
+            time.sleep(1)
+            if session_state:
+                session_state.save_selenium(driver)
+        except Exception as e:
+            print(f"  未找到Cookie弹窗: {str(e)}")
 
     # 点击"Load more homes"直到没有更多内容
     click_count = 0
     max_clicks = 20
+    card_count = selenium_counter(driver, HOMESITE_CARD_SELECTOR)
 
     while click_count < max_clicks:
         try:
-            button = WebDriverWait(driver, 15).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, "button[aria-label='Load more homes']")))
+            with profile_stage("wait"):
+                button = WebDriverWait(driver, 15).until(
+                    EC.element_to_be_clickable((By.CSS_SELECTOR, "button[aria-label='Load more homes']")))
 
-            # 滚动到按钮位置
-            driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", button)
-            time.sleep(1.5)
+            # 滚动到按钮位置（立即滚动，不等平滑滚动动画）
+            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
 
             # 点击
+            before = card_count()
             driver.execute_script("arguments[0].click();", button)
             click_count += 1
             print(f"  点击加载更多按钮 ({click_count}次)")
 
-            # 随机等待时间
-            time.sleep(random.uniform(2.0, 4.0))
+            # 等待新卡片加载完成：数量增长后保持稳定即继续
+            with profile_stage("wait"):
+                after, _ = wait_for_stable_count(card_count, quiet_period=1.0, timeout=15, baseline=before)
+            if after <= before:
+                print(f"  点击后卡片数量未增加 ({before})，停止加载")
+                break
 
         except Exception as e:
             print(f"  没有更多内容或加载超时: {str(e)}")
@@ -120,15 +228,16 @@ def get_links_for_market(driver, state_code, market_code):
 
     print(f"  完成加载，共点击 {click_count} 次")
 
-    # 获取完整页面源码
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
+    # 在浏览器内一次性取出所有房源卡片链接，不必传回整页源码再解析
+    with profile_stage("parse"):
+        link_elements = extract_cards_selenium(driver, HOMESITE_CARD_SELECTOR, {
+            "href": field(attr="href"),
+        })
 
     # 提取所有链接
     links = []
-    link_elements = soup.select('a.HomesiteCard_link__CyDpK[href]')
-
     for link in link_elements:
-        href = link.get('href')
+        href = link["href"]
         if href and href.startswith("/new-homes"):
             full_url = base_url + href
             links.append(full_url)
@@ -139,25 +248,15 @@ def get_links_for_market(driver, state_code, market_code):
     return unique_links
 
 
-# 从房源页面提取详细信息
-def extract_property_data(url):
-    headers = {
-        'User-Agent': random.choice([
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0",
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15"
-        ])
-    }
+# 每个市场只计入一次选择器健康检查：重试或队列重新领取同一市场时覆盖之前的结果
+def observe_market(state_code, market, links):
+    if selector_health:
+        selector_health.observe_listing(HOMESITE_CARD_SELECTOR, len(links), f"{state_code}/{market}")
 
-    try:
-        # 添加随机延迟
-        time.sleep(random.uniform(0.5, 2.0))
-
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
 
+# 从已解析的房源页面中提取详细信息
+def parse_property_page(soup, url):
+    with profile_stage("extract"):
         # 初始化字典
         data = {
             'date_scraped': datetime.now().strftime('%Y-%m-%d'),
@@ -282,92 +381,402 @@ def extract_property_data(url):
 
         return data
 
+
+# 从房源页面提取详细信息
+def extract_property_data(url):
+    headers = {
+        'User-Agent': random.choice([
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36",
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0",
+            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15"
+        ])
+    }
+
+    try:
+        # 添加随机延迟
+        time.sleep(random.uniform(0.5, 2.0))
+
+        with profile_stage("navigation"):
+            response = requests.get(url, headers=headers, timeout=30)
+            response.raise_for_status()
+        with profile_stage("parse"):
+            soup = BeautifulSoup(response.text, 'html.parser')
+
+        # 归档原始页面，选择器失效时可离线重新提取
+        if page_archive:
+            page_archive.store(url, response.text, response.status_code)
+
+        data = parse_property_page(soup, url)
+        # 先检查页面本身的提取结果，缓存补全的字段会掩盖失效的选择器
+        if selector_health:
+            selector_health.observe_row(data)
+        # 同一社区同一户型的参数相同，页面缺失的字段从户型缓存补全
+        if plan_cache and data:
+            plan_cache.apply("Lennar", data["community"], data["plan"], data)
+        resolve_dead_letter("property", url)
+        return data
+
     except Exception as e:
         print(f"  爬取房源页面 {url} 时出错: {str(e)}")
+        dead_letter("property", url, e)
         return None
 
 
+# 为市场创建新的WebDriver实例获取房源链接，失败时重试
+def fetch_market_links(state_code, market, max_retries=3):
+    driver = None
+    retry_count = 0
+    links = []
+    loaded = False  # 至少有一次打开了市场页面；导航失败不计入选择器健康检查
+    last_error = "未获取到房源链接"
+
+    # 选择器已失效时不再重试，每次重试都要重新启动浏览器
+    while retry_count < max_retries and not links and not selectors_broken():
+        try:
+            # 创建新的WebDriver实例
+            driver = setup_driver()
+            with profile_stage("discovery"):
+                links = get_links_for_market(driver, state_code, market)
+            loaded = loaded or links is not None
+            links = links or []
+            if not links:
+                print(f"  未获取到房源链接，重试 {retry_count + 1}/{max_retries}")
+                last_error = "未获取到房源链接"
+        except Exception as e:
+            print(f"  获取链接失败: {str(e)}，重试 {retry_count + 1}/{max_retries}")
+            last_error = e
+        finally:
+            # 确保driver被关闭
+            if driver:
+                try:
+                    driver.quit()
+                except:
+                    pass
+                driver = None
+
+        # 出错或没有找到任何链接都计为一次重试
+        if not links:
+            retry_count += 1
+            if retry_count < max_retries and not selectors_broken():
+                time.sleep(10)
+
+    if loaded:
+        observe_market(state_code, market, links)
+    if links:
+        resolve_dead_letter("market", market_url(state_code, market))
+    else:
+        dead_letter("market", market_url(state_code, market), last_error)
+    return links
+
+
+# 重试死信中的URL，成功提取的数据追加到CSV
+def replay_dead_letters(csv_filename):
+    if not dead_letters:
+        return
+
+    file_exists = os.path.exists(csv_filename)
+    with open(csv_filename, 'a', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        if not file_exists:
+            writer.writeheader()
+
+        def replay_market(url):
+            if selectors_broken():
+                return False
+            query = parse_qs(urlparse(url).query)
+            links = fetch_market_links(query["state"][0], query["market"][0])
+            for i, link in enumerate(links, 1):
+                if selectors_broken():
+                    break
+                print(f"  [{i}/{len(links)}] 爬取房源: {link}")
+                property_data = extract_property_data(link)
+                if property_data:
+                    write_property(writer, csvfile, property_data)
+            return bool(links)
+
+        def replay_property(url):
+            property_data = extract_property_data(url)
+            if property_data:
+                write_property(writer, csvfile, property_data)
+            return bool(property_data)
+
+        succeeded, failed = dead_letters.replay({"market": replay_market, "property": replay_property})
+    if succeeded or failed:
+        print(f"\n重放完成: 成功 {succeeded}，仍失败 {failed}")
+
+
+# 队列工作进程：多个进程共享同一个队列文件，共同完成一次爬取
+def run_queue_worker(queue_path, csv_filename, worker_id=None, lease_seconds=300):
+    worker_id = worker_id or default_worker_id()
+    queue = JobQueue(queue_path, lease_seconds=lease_seconds)
+
+    # 每个进程都可以安全地播种，已存在的任务会被忽略
+    markets = [(f"{state_code}/{market}", {"state_code": state_code, "market": market})
+               for state_code, market_codes in STATE_MARKETS.items() for market in market_codes]
+    added = queue.enqueue_many("market", markets, priority=1)
+    if added:
+        print(f"已将 {added} 个市场加入队列: {queue_path}")
+
+    with open(csv_filename, 'a', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        if csvfile.tell() == 0:
+            writer.writeheader()
+
+        def handle_market(payload):
+            driver = setup_driver()
+            try:
+                with profile_stage("discovery"):
+                    links = get_links_for_market(driver, payload["state_code"], payload["market"])
+            finally:
+                try:
+                    driver.quit()
+                except:
+                    pass
+            if links is not None:
+                observe_market(payload["state_code"], payload["market"], links)
+            if not links:
+                raise RuntimeError(f"未获取到房源链接: {payload['state_code']}/{payload['market']}")
+            added = queue.enqueue_many("property", [(link, {"url": link}) for link in links])
+            print(f"  市场 {payload['state_code']}/{payload['market']}: 新增 {added}/{len(links)} 个房源任务")
+
+        def handle_property(payload):
+            property_data = extract_property_data(payload["url"])
+            if not property_data:
+                raise RuntimeError(f"房源爬取失败: {payload['url']}")
+            write_property(writer, csvfile, property_data)
+
+        processed = run_worker(queue, worker_id, {
+            "market": handle_market,
+            "property": handle_property,
+        }, should_stop=selectors_broken)
+
+    counts = queue.counts()
+    queue.close()
+    print(f"\n{'=' * 50}")
+    print(f"工作进程 {worker_id} 完成，共处理 {processed} 个任务")
+    print(f"队列状态: 待处理 {counts['pending']} | 进行中 {counts['leased']} | "
+          f"完成 {counts['done']} | 失败 {counts['failed']}")
+    print(f"数据已保存到: {csv_filename}")
+    print(f"{'=' * 50}")
+
+
+# 站点地图发现：直接从XML获取房源URL，跳过市场页面的浏览器渲染和"Load more"点击
+def scrape_from_sitemap(csv_filename):
+    entries = discover_urls(SITEMAP_URLS, SITEMAP_PROPERTY_PATTERNS)
+    if not entries:
+        print("站点地图中未找到任何房源URL，请检查站点地图地址或匹配模式")
+        return 0
+
+    # lastmod未变化的房源沿用CSV中该链接最近一次的数据
+    lastmod_store = LastmodStore(SITEMAP_LASTMOD_FILE)
+    unchanged = {url for url, lastmod in entries.items() if lastmod_store.is_unchanged(url, lastmod)}
+    previous_rows = load_previous_rows(csv_filename, unchanged)
+    print(f"站点地图发现 {len(entries)} 个房源，其中 {len(previous_rows)} 个未变化，沿用上次数据")
+
+    file_exists = os.path.exists(csv_filename)
+    today = run_date or datetime.now().strftime('%Y-%m-%d')
+    total_homes = 0
+
+    with open(csv_filename, 'a', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        if not file_exists:
+            writer.writeheader()
+
+        for i, (link, lastmod) in enumerate(entries.items(), 1):
+            if selectors_broken():
+                break
+            if link in previous_rows:
+                property_data = previous_rows[link]
+                property_data['date_scraped'] = today
+            else:
+                print(f"  [{i}/{len(entries)}] 爬取房源: {link}")
+                property_data = extract_property_data(link)
+
+            if property_data:
+                write_property(writer, csvfile, property_data)
+                lastmod_store.update(link, lastmod)
+                total_homes += 1
+            else:
+                print(f"  房源爬取失败: {link}")
+
+            # 定期保存lastmod记录，中断后也能复用
+            if i % 50 == 0:
+                lastmod_store.save()
+
+    lastmod_store.save()
+    print(f"\n{'=' * 50}")
+    print(f"站点地图爬取完成！共爬取 {total_homes}/{len(entries)} 个房源")
+    print(f"数据已保存到: {csv_filename}")
+    print(f"{'=' * 50}")
+    return total_homes
+
+
+# CSV是追加写入的，按爬取日期划分快照，与上一次爬取对比生成变更增量
+def report_changes(csv_filename, run_date, scheduler=None):
+    if selectors_broken():
+        # 本次数据不完整，对比会把大量房源误判为下架
+        print("⚠️ 选择器健康检查未通过，跳过快照对比")
+        return
+    old_date = previous_date(csv_filename, run_date)
+    if not old_date:
+        return
+    changes_file = f"lennar_changes_{run_date}.jsonl"
+    # 被时间预算推迟的市场本次没有写入任何行，其房源不能算作下架
+    deferred = scheduler.deferred_links() if scheduler else set()
+    try:
+        counts = diff_snapshots(csv_filename, csv_filename, changes_file,
+                                old_date=old_date, new_date=run_date,
+                                skip_removed=lambda key: link_digest(key[-1]) in deferred)
+        print_diff_summary(counts, changes_file)
+    except Exception as e:
+        print(f"快照对比失败: {str(e)}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Lennar 房源爬虫")
+    parser.add_argument("command", nargs="?", choices=["crawl", "reextract", "replay"], default="crawl",
+                        help="crawl 在线爬取(默认); reextract 从页面归档离线重新提取，不访问网络; "
+                             "replay 只重试之前失败的URL")
+    parser.add_argument("--profile", action="store_true",
+                        help="开启性能分析，按阶段输出火焰图折叠栈和热点汇总")
+    parser.add_argument("--profile-interval", type=float, default=5.0,
+                        help="性能分析采样间隔(毫秒)")
+    parser.add_argument("--profile-top", type=int, default=20,
+                        help="热点汇总中每个阶段显示的函数数量")
+    parser.add_argument("--queue", metavar="PATH",
+                        help="共享任务队列(SQLite)路径；多个进程指向同一文件即可分担同一次爬取")
+    parser.add_argument("--worker-id", help="工作进程标识，默认为 主机名-进程号")
+    parser.add_argument("--lease-seconds", type=int, default=300,
+                        help="任务租约时长(秒)，进程崩溃后超过该时长任务重新入队")
+    parser.add_argument("--discovery", choices=["browser", "sitemap"], default="browser",
+                        help="房源发现方式: browser 渲染市场页面; sitemap 读取XML站点地图")
+    parser.add_argument("--archive-dir", default=DEFAULT_ARCHIVE_DIR, help="原始页面归档目录")
+    parser.add_argument("--no-archive", action="store_true", help="不归档抓取的页面")
+    parser.add_argument("--no-session-state", action="store_true",
+                        help="不加载/保存浏览器Cookie，每个driver都从空会话开始")
+    parser.add_argument("--reextract-date", metavar="YYYY-MM-DD",
+                        help="reextract 时只使用该日期抓取的页面，默认每个URL取最新一次")
+    parser.add_argument("--workers", type=int, help="reextract 并行进程数，默认为CPU核数")
+    parser.add_argument("--no-plan-cache", action="store_true",
+                        help="不使用户型属性缓存")
+    parser.add_argument("--store", nargs="?", const=DEFAULT_STORE_PATH, metavar="PATH",
+                        help=f"同时写入SQLite房源数据库(默认 {DEFAULT_STORE_PATH})，保存当前状态和价格/状态历史")
+    parser.add_argument("--no-health-check", action="store_true",
+                        help="关闭选择器健康检查（字段提取率过低时不提前停止）")
+    parser.add_argument("--no-replay", action="store_true", help="爬取结束时不自动重放失败的URL")
+    parser.add_argument("--time-budget", metavar="DURATION",
+                        help="本次爬取的时间预算，如 5400、90m、2h；设置后按历史优先级排序并推迟放不下的市场")
+    return parser.parse_args()
+
+
 # 主函数
 def main():
+    global page_archive, session_state, dead_letters, plan_cache, selector_health, listing_store, run_date
+
+    args = parse_args()
+    if args.profile:
+        enable_profiling(interval=args.profile_interval / 1000, top_n=args.profile_top)
+
+    if args.command == "reextract":
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        reextract(parse_property_page, "Lennar", f"lennar_reextract_{timestamp}.csv", FIELDNAMES,
+                  root=args.archive_dir, date=args.reextract_date, workers=args.workers)
+        return
+
+    if not args.no_archive:
+        page_archive = PageArchive(args.archive_dir, builder="Lennar")
+    if not args.no_session_state:
+        session_state = SessionState(SESSION_STATE_FILE)
+    dead_letters = DeadLetterStore(DEAD_LETTER_FILE)
+    if not args.no_plan_cache:
+        plan_cache = PlanCache(PLAN_CACHE_FILE)
+    if not args.no_health_check:
+        selector_health = SelectorHealth("Lennar", FIELD_SELECTORS)
+    if args.store:
+        listing_store = ListingStore(args.store)
+
     # 设置CSV文件
     csv_filename = "lennar_all_homes.csv"
-    fieldnames = [
-        'date_scraped', 'builder', 'brand', 'community', 'address', 'city',
-        'state', 'zip', 'plan_type', 'plan', 'floors', 'bedrooms',
-        'full_bathrooms', 'half_bathrooms', 'garage', 'sqft', 'price',
-        'home_id', 'status', 'link'
-    ]
+    fieldnames = FIELDNAMES
+    run_date = datetime.now().strftime('%Y-%m-%d')
+
+    if args.command == "replay":
+        # 只处理失败的URL，数据追加到主CSV
+        replay_dead_letters(csv_filename)
+        return
+
+    if args.queue:
+        # 队列模式下每个进程写入自己的CSV，避免多进程同时追加同一文件
+        worker_id = args.worker_id or default_worker_id()
+        csv_filename = f"lennar_all_homes_{worker_id}.csv"
+        run_queue_worker(args.queue, csv_filename, worker_id, args.lease_seconds)
+        return
 
     file_exists = os.path.exists(csv_filename)
 
+    if args.discovery == "sitemap":
+        scrape_from_sitemap(csv_filename)
+        if not args.no_replay and not selectors_broken():
+            replay_dead_letters(csv_filename)
+        report_changes(csv_filename, run_date)
+        return
+
+    time_budget = parse_duration(args.time_budget) if args.time_budget else None
+    scheduler = CrawlScheduler(MARKET_HISTORY_FILE, time_budget=time_budget)
+
     # 打开CSV
     with open(csv_filename, 'a', newline='', encoding='utf-8') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         if not file_exists:
             writer.writeheader()
 
-        # 遍历所有州和市场
+        # 按调度顺序遍历所有市场；有时间预算时优先爬取单位时间内变化最多的市场
         total_homes = 0
-        for state_code, markets in STATE_MARKETS.items():
+        market_keys = [f"{state_code}/{market}" for state_code, markets in STATE_MARKETS.items() for market in markets]
+        for market_key in scheduler.order(market_keys):
+            if selectors_broken():
+                break
+            state_code, market = market_key.split("/")
+            if not scheduler.should_start(market_key):
+                print(f"\n⏭️ 推迟市场: {market_key}，时间预算不足")
+                continue
+
             print(f"\n{'=' * 50}")
-            print(f"开始处理州: {state_code}")
+            print(f"开始处理市场: {state_code}/{market}")
             print(f"{'=' * 50}")
+            market_start = time.time()
 
-            for market in markets:
-                print(f"\n{'=' * 50}")
-                print(f"开始处理市场: {state_code}/{market}")
-                print(f"{'=' * 50}")
+            links = fetch_market_links(state_code, market)
 
-                # 为每个市场创建新的WebDriver实例
-                driver = None
-                retry_count = 0
-                max_retries = 3
-                links = []
-
-                while retry_count < max_retries and not links:
-                    try:
-                        # 创建新的WebDriver实例
-                        driver = setup_driver()
-                        links = get_links_for_market(driver, state_code, market)
-                    except Exception as e:
-                        print(f"  获取链接失败: {str(e)}，重试 {retry_count + 1}/{max_retries}")
-                        retry_count += 1
-                        # 关闭失败的driver
-                        if driver:
-                            try:
-                                driver.quit()
-                            except:
-                                pass
-                        time.sleep(10)
-                    finally:
-                        # 确保driver被关闭
-                        if driver:
-                            try:
-                                driver.quit()
-                            except:
-                                pass
-
-                if not links:
-                    print(f"  无法获取市场 {state_code}/{market} 的房源链接，跳过")
-                    continue
-
-                # 处理每个房源
-                for i, link in enumerate(links, 1):
-                    print(f"  [{i}/{len(links)}] 爬取房源: {link}")
-
-                    time.sleep(random.uniform(0.5, 2.0))
-
-                    property_data = extract_property_data(link)
-
-                    if property_data:
-                        writer.writerow(property_data)
-                        csvfile.flush()  # 立即写入磁盘
-                        total_homes += 1
-                    else:
-                        print(f"  房源爬取失败: {link}")
-
-                # 市场处理完成
-                print(f"\n市场 {state_code}/{market} 处理完成，共爬取 {len(links)} 个房源")
+            if not links:
+                print(f"  无法获取市场 {state_code}/{market} 的房源链接，跳过")
+                scheduler.record(market_key, links, time.time() - market_start, success=False)
+                continue
+
+            # 处理每个房源
+            for i, link in enumerate(links, 1):
+                if selectors_broken():
+                    break
+                print(f"  [{i}/{len(links)}] 爬取房源: {link}")
+
+                scheduler.pause(0.5, 2.0)
+
+                property_data = extract_property_data(link)
+
+                if property_data:
+                    write_property(writer, csvfile, property_data)
+                    total_homes += 1
+                else:
+                    print(f"  房源爬取失败: {link}")
+
+            if selectors_broken():
+                # 中途停止的市场数据不完整，不计入爬取历史
+                break
+
+            # 市场处理完成
+            scheduler.record(market_key, links, time.time() - market_start)
+            print(f"\n市场 {state_code}/{market} 处理完成，共爬取 {len(links)} 个房源")
 
         # 所有市场处理完成
         print(f"\n{'=' * 50}")
@@ -375,6 +784,28 @@ def main():
         print(f"数据已保存到: {csv_filename}")
         print(f"{'=' * 50}")
 
+    # 重放失败的URL，结果参与随后的快照对比
+    if not args.no_replay and scheduler.remaining() > 0 and not selectors_broken():
+        replay_dead_letters(csv_filename)
+
+    scheduler.report()
+    report_changes(csv_filename, run_date, scheduler)
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        finish_profiling("lennar")
+        if page_archive:
+            page_archive.close()
+        if dead_letters:
+            dead_letters.report()
+            dead_letters.close()
+        if plan_cache:
+            plan_cache.report()
+            plan_cache.close()
+        if selector_health:
+            selector_health.report()
+        if listing_store:
+            listing_store.close()
\ No newline at end of file
@@ -0,0 +1,196 @@
+import os
+import csv
+import sys
+import time
+import sqlite3
+import argparse
+
+from home_record import FIELDNAMES, INT_FIELDS, FLOAT_FIELDS, normalize_batch
+
+# 默认数据库文件，所有建筑商共用（以 builder 区分）
+DEFAULT_STORE_PATH = "listings.sqlite"
+
+# 缓冲多少行或多少秒后在一个事务中批量写入
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 60
+
+
+def _column_type(name):
+    if name in INT_FIELDS:
+        return "INTEGER"
+    if name in FLOAT_FIELDS:
+        return "REAL"
+    return "TEXT"
+
+
+_COLUMNS = ", ".join(f"{name} {_column_type(name)}" for name in FIELDNAMES)
+_NAMES = ", ".join(FIELDNAMES)
+_SELECT_STAGED = ", ".join(f"s.{name}" for name in FIELDNAMES)
+
+
+class ListingStore:
+    """房源数据的SQLite存储
+
+    - listings: 每个房源的当前状态，按 (builder, listing_key) 更新插入，记录首次/最近出现日期；
+      listing_key 与快照对比一致，优先用链接，缺失时退回 home_id
+    - listing_history: 只追加的价格/状态历史，房源新出现或价格、状态变化时写入一行
+    写入先缓冲，每批在一个事务中完成：先写入临时表，再按爬取日期从早到晚，
+    每个日期用两条集合SQL生成历史并更新当前表。
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        self._buffer = []
+        self._last_flush = time.time()
+        self.written = 0
+        self.history_rows = 0
+
+    def _create_schema(self):
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS listings (
+                listing_key TEXT NOT NULL,
+                {_COLUMNS},
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                PRIMARY KEY (builder, listing_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_listings_state ON listings (builder, state);
+            CREATE INDEX IF NOT EXISTS idx_listings_community ON listings (builder, community);
+            CREATE INDEX IF NOT EXISTS idx_listings_last_seen ON listings (last_seen);
+
+            CREATE TABLE IF NOT EXISTS listing_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                builder TEXT NOT NULL,
+                listing_key TEXT NOT NULL,
+                date_scraped TEXT NOT NULL,
+                price INTEGER,
+                status TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_history_listing ON listing_history (builder, listing_key, date_scraped);
+            CREATE INDEX IF NOT EXISTS idx_history_date ON listing_history (date_scraped, builder);
+
+            CREATE TEMP TABLE IF NOT EXISTS staging (listing_key TEXT NOT NULL, {_COLUMNS});
+        """)
+
+    def add(self, row):
+        """缓冲一行原始提取结果，达到批量大小或间隔时间后写入"""
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size or time.time() - self._last_flush > FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        self._last_flush = time.time()
+        params = [(record.link or record.home_id,) + tuple(getattr(record, name) for name in FIELDNAMES)
+                  for record in normalize_batch(rows)
+                  if record.builder and record.date_scraped and (record.link or record.home_id)]
+        if not params:
+            return
+        updates = ", ".join(f"{name} = excluded.{name}" for name in FIELDNAMES if name != "builder")
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany(
+                f"INSERT INTO staging (listing_key, {_NAMES}) VALUES ({', '.join('?' * (len(FIELDNAMES) + 1))})",
+                params
+            )
+            # 同一房源同一天重复的行只保留最后一行；不同日期的行都保留，按日期依次应用
+            self.conn.execute("DELETE FROM staging WHERE rowid NOT IN "
+                              "(SELECT MAX(rowid) FROM staging GROUP BY builder, listing_key, date_scraped)")
+            dates = [row[0] for row in self.conn.execute(
+                "SELECT DISTINCT date_scraped FROM staging ORDER BY date_scraped")]
+            for date_scraped in dates:
+                # 新房源或价格/状态变化 -> 追加历史
+                cursor = self.conn.execute("""
+                    INSERT INTO listing_history (builder, listing_key, date_scraped, price, status)
+                    SELECT s.builder, s.listing_key, s.date_scraped, s.price, s.status
+                    FROM staging s LEFT JOIN listings l
+                        ON l.builder = s.builder AND l.listing_key = s.listing_key
+                    WHERE s.date_scraped = ?
+                        AND (l.listing_key IS NULL OR l.price IS NOT s.price OR l.status IS NOT s.status)
+                """, (date_scraped,))
+                self.history_rows += cursor.rowcount
+                # 更新当前表；按日期先后导入时，较旧的数据不会覆盖较新的数据
+                self.conn.execute(f"""
+                    INSERT INTO listings (listing_key, {_NAMES}, first_seen, last_seen)
+                    SELECT s.listing_key, {_SELECT_STAGED}, s.date_scraped, s.date_scraped
+                    FROM staging s WHERE s.date_scraped = ?
+                    ON CONFLICT (builder, listing_key) DO UPDATE SET {updates}, last_seen = excluded.last_seen
+                    WHERE excluded.last_seen >= listings.last_seen
+                """, (date_scraped,))
+            self.conn.execute("DELETE FROM staging")
+            self.conn.execute("COMMIT")
+            self.written += len(params)
+        except sqlite3.Error as e:
+            # BEGIN 本身失败（如被其他进程锁住）时没有可回滚的事务
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            print(f"⚠️ 写入房源数据库失败，本批 {len(params)} 行未写入: {str(e)}")
+
+    def price_history(self, builder, key):
+        """某个房源的价格/状态变化历史，按日期排序"""
+        return self.conn.execute(
+            "SELECT date_scraped, price, status FROM listing_history "
+            "WHERE builder = ? AND listing_key = ? ORDER BY date_scraped, id",
+            (builder, key)
+        ).fetchall()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def import_csv(store, csv_path):
+    """把已有的CSV（追加写入的主文件或历史备份）导入数据库，应按日期先后依次导入"""
+    count = 0
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            store.add(row)
+            count += 1
+    store.flush()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="房源数据库：导入CSV、查询价格历史")
+    parser.add_argument("--db", default=DEFAULT_STORE_PATH, help="数据库文件")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="导入CSV，多个文件按参数顺序导入（应从旧到新）")
+    import_parser.add_argument("csv_files", nargs="+")
+
+    history_parser = subparsers.add_parser("history", help="查询房源的价格/状态历史")
+    history_parser.add_argument("builder", help="建筑商，如 Lennar、Toll Brothers")
+    history_parser.add_argument("key", help="房源链接（没有链接时为 home_id）")
+    args = parser.parse_args()
+
+    store = ListingStore(args.db)
+    try:
+        if args.command == "import":
+            for csv_path in args.csv_files:
+                if not os.path.exists(csv_path):
+                    print(f"❌ 文件不存在: {csv_path}")
+                    continue
+                start_time = time.time()
+                count = import_csv(store, csv_path)
+                print(f"✅ 已导入 {csv_path}: {count} 行，耗时 {time.time() - start_time:.2f}秒")
+            print(f"新增历史记录 {store.history_rows} 条")
+        else:
+            history = store.price_history(args.builder, args.key)
+            if not history:
+                print("❌ 没有该房源的记录")
+                sys.exit(1)
+            for date_scraped, price, status in history:
+                print(f"{date_scraped}  {price if price is not None else '-':>10}  {status or ''}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
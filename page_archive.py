@@ -0,0 +1,198 @@
+import os
+import csv
+import gzip
+import json
+import time
+import sqlite3
+import datetime
+import multiprocessing
+
+from home_record import normalize_rows
+
+# 默认归档目录
+DEFAULT_ARCHIVE_DIR = "page_archive"
+
+
+class PageArchive:
+    """抓取页面的压缩归档
+
+    每个页面作为一个独立的gzip成员追加写入归档文件（与WARC.gz相同的分帧方式），
+    可以按偏移量单独解压；SQLite索引记录 URL、抓取时间、文件和偏移量。
+    每个进程写自己的归档文件，多个爬虫进程可以共享同一个归档目录。
+    """
+
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR, builder=""):
+        self.root = root
+        self.builder = builder
+        os.makedirs(root, exist_ok=True)
+        self._index = None
+        self._file = None
+        self._file_name = None
+
+    def _conn(self):
+        if self._index is None:
+            self._index = open_index(self.root)
+        return self._index
+
+    def _archive_file(self, date):
+        file_name = f"{self.builder.replace(' ', '_').lower()}_{date}_{os.getpid()}.pages.gz"
+        if file_name != self._file_name:
+            if self._file:
+                self._file.close()
+            self._file = open(os.path.join(self.root, file_name), 'ab')
+            self._file_name = file_name
+        return self._file
+
+    def store(self, url, html, status=None):
+        """归档一个页面；失败只打印警告，不影响爬取"""
+        try:
+            now = datetime.datetime.now()
+            fetch_date = now.strftime('%Y-%m-%d')
+            header = {"url": url, "builder": self.builder, "fetched_at": now.isoformat(timespec='seconds'),
+                      "status": status}
+            blob = gzip.compress(json.dumps(header, ensure_ascii=False).encode('utf-8') + b"\n" +
+                                 html.encode('utf-8'), compresslevel=6)
+
+            f = self._archive_file(now.strftime('%Y%m%d'))
+            offset = f.tell()
+            f.write(blob)
+            f.flush()
+
+            self._conn().execute(
+                "INSERT INTO pages (url, builder, fetched_at, fetch_date, file, offset, length, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, self.builder, header["fetched_at"], fetch_date, self._file_name, offset, len(blob), status)
+            )
+        except Exception as e:
+            print(f"⚠️ 页面归档失败: {url} | {str(e)}")
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+
+def open_index(root):
+    conn = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=60, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            builder TEXT NOT NULL,
+            fetched_at TEXT NOT NULL,
+            fetch_date TEXT NOT NULL,
+            file TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            status INTEGER
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_url ON pages (url, fetched_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_builder_date ON pages (builder, fetch_date)")
+    return conn
+
+
+# 读取时复用已打开的归档文件
+_read_handles = {}
+
+
+def read_record(root, file_name, offset, length):
+    """按索引读取并解压一条归档记录，返回(头信息, html)"""
+    path = os.path.join(root, file_name)
+    f = _read_handles.get(path)
+    if f is None:
+        f = _read_handles[path] = open(path, 'rb')
+    f.seek(offset)
+    data = gzip.decompress(f.read(length))
+    header, _, html = data.partition(b"\n")
+    return json.loads(header), html.decode('utf-8')
+
+
+def select_pages(root, builder, date=None):
+    """选出每个URL最新的一条归档记录；指定date时只取当天抓取的页面"""
+    conn = open_index(root)
+    query = ("SELECT url, fetch_date, file, offset, length FROM pages WHERE id IN ("
+             "SELECT MAX(id) FROM pages WHERE builder = ?")
+    params = [builder]
+    if date:
+        query += " AND fetch_date = ?"
+        params.append(date)
+    query += " GROUP BY url) ORDER BY id"
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    return rows
+
+
+_worker_state = {}
+
+
+def _init_worker(root, parse_func):
+    _worker_state["root"] = root
+    _worker_state["parse"] = parse_func
+
+
+def _reextract_one(task):
+    from bs4 import BeautifulSoup
+
+    url, fetch_date, file_name, offset, length = task
+    try:
+        _, html = read_record(_worker_state["root"], file_name, offset, length)
+        soup = BeautifulSoup(html, 'html.parser')
+        row = _worker_state["parse"](soup, url)
+        if row:
+            # 数据日期以页面实际抓取日期为准
+            row["date_scraped"] = fetch_date
+        return row, None
+    except Exception as e:
+        return None, f"{url} | {type(e).__name__}: {str(e)}"
+
+
+def reextract(parse_func, builder, output_csv, fieldnames, root=DEFAULT_ARCHIVE_DIR, date=None, workers=None):
+    """离线重新提取：多进程并行解析归档页面，不访问网络
+
+    parse_func(soup, url) 必须是模块级函数，以便传给子进程。
+    """
+    start_time = time.time()
+    tasks = select_pages(root, builder, date)
+    if not tasks:
+        print(f"❌ 归档中没有 {builder} 的页面" + (f" (日期 {date})" if date else ""))
+        return 0
+
+    workers = workers or os.cpu_count() or 1
+    print(f"开始离线重新提取: {len(tasks)} 个页面，{workers} 个进程")
+
+    success = 0
+    failures = []
+    batch = []
+    with open(output_csv, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(root, parse_func)) as pool:
+            for i, (row, error) in enumerate(pool.imap(_reextract_one, tasks, chunksize=16), 1):
+                if row:
+                    batch.append(row)
+                    success += 1
+                elif error:
+                    failures.append(error)
+                # 按批次统一标准化数值字段后写入
+                if len(batch) >= 1000:
+                    writer.writerows(normalize_rows(batch))
+                    batch = []
+                if i % 1000 == 0:
+                    print(f"  已处理 {i}/{len(tasks)} 个页面")
+        writer.writerows(normalize_rows(batch))
+
+    elapsed = time.time() - start_time
+    print(f"\n{'=' * 80}")
+    print(f"离线重新提取完成: 成功 {success}/{len(tasks)}，耗时 {elapsed:.2f}秒")
+    print(f"数据已保存到: {output_csv}")
+    for error in failures[:20]:
+        print(f"  ❌ {error}")
+    if len(failures) > 20:
+        print(f"  ... 另有 {len(failures) - 20} 个失败")
+    print(f"{'=' * 80}")
+    return success
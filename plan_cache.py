@@ -0,0 +1,122 @@
+import json
+import time
+import sqlite3
+
+# 只取决于户型、同一社区内所有房源相同的字段
+PLAN_FIELDS = ("plan_type", "floors", "bedrooms", "full_bathrooms", "half_bathrooms", "garage", "sqft")
+# 这些字段齐全时才写入缓存，避免把加载不完整的页面缓存下来
+REQUIRED_FIELDS = ("bedrooms", "sqft")
+
+# 默认有效期：户型参数很少变化，一周后重新以页面为准
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class PlanCache:
+    """户型级属性缓存，键为 (建筑商, 社区, 户型)
+
+    同一户型的卧室、浴室、车库、面积、层数在社区内的所有房源上都相同，
+    页面上有值时以页面为准并刷新缓存，缺失时从缓存补全。
+    键中的户型必须是多个房源共用的标识（如 Lennar 房源页上的户型名），
+    每个房源一个的值（如URL）不会在房源之间共享任何数据。
+    每个字段单独记录更新时间，只有页面上实际出现的值才会刷新，补全出来的值按原时间过期。
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS plans (
+                builder TEXT NOT NULL,
+                community TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                fields TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (builder, community, plan)
+            )
+        """)
+        self._memory = {}
+        self.hits = 0
+        self.misses = 0
+        self.filled = 0  # 从缓存补全的字段数
+
+    def _load(self, key):
+        """返回 {字段: (值, 更新时间)}，没有记录时返回空字典"""
+        entry = self._memory.get(key)
+        if entry is None:
+            row = self.conn.execute(
+                "SELECT fields, updated_at FROM plans WHERE builder = ? AND community = ? AND plan = ?", key
+            ).fetchone()
+            entry = {}
+            if row:
+                for name, value in json.loads(row[0]).items():
+                    # 旧格式只有一个整体的更新时间
+                    entry[name] = tuple(value) if isinstance(value, list) else (value, row[1])
+            self._memory[key] = entry
+        return entry
+
+    def get(self, builder, community, plan):
+        """返回未过期的户型字段字典；必需字段缺失或已过期时返回 None"""
+        if not plan:
+            return None
+        now = time.time()
+        fields = {name: value for name, (value, updated_at) in self._load((builder, community, plan)).items()
+                  if value and now - updated_at <= self.ttl}
+        if not all(fields.get(name) for name in REQUIRED_FIELDS):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return fields
+
+    def put(self, builder, community, plan, row):
+        """用页面上实际出现的户型字段刷新缓存；row 中不能含有从缓存补全的值"""
+        if not plan or not all(row.get(name) for name in REQUIRED_FIELDS):
+            return
+        key = (builder, community, plan)
+        now = time.time()
+        entry = self._load(key)
+        updated = dict(entry)
+        for name in PLAN_FIELDS:
+            value = row.get(name)
+            if not value:
+                continue
+            cached = entry.get(name)
+            if cached and cached[0] == value and now - cached[1] < self.ttl / 2:
+                # 内容未变且离过期还早，不必每个房源都写一次
+                continue
+            updated[name] = (value, now)
+        if updated == entry:
+            return
+        self._memory[key] = updated
+        try:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO plans (builder, community, plan, fields, updated_at) VALUES (?, ?, ?, ?, ?)",
+                key + (json.dumps({name: list(value) for name, value in updated.items()}, ensure_ascii=False),
+                       max(updated_at for _, updated_at in updated.values()))
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ 写入户型缓存失败: {plan} | {str(e)}")
+
+    def apply(self, builder, community, plan, row):
+        """用缓存补全 row 中缺失的户型字段，页面数据完整时刷新缓存；返回补全的字段数"""
+        # 只用页面本身的数据刷新缓存，补全出来的值不能延长缓存有效期
+        own = {name: row.get(name) for name in PLAN_FIELDS if row.get(name)}
+        filled = 0
+        if len(own) < len(PLAN_FIELDS):
+            cached = self.get(builder, community, plan)
+            if cached:
+                for name in PLAN_FIELDS:
+                    if not row.get(name) and cached.get(name):
+                        row[name] = cached[name]
+                        filled += 1
+        self.filled += filled
+        self.put(builder, community, plan, own)
+        return filled
+
+    def report(self):
+        print(f"户型缓存: 命中 {self.hits} | 未命中 {self.misses} | 补全字段 {self.filled}")
+
+    def close(self):
+        self.conn.close()
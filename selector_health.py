@@ -0,0 +1,87 @@
+from collections import deque, OrderedDict
+
+# 参与健康检查的页面数（滑动窗口），覆盖开局的前K个页面和运行中途的改版
+SAMPLE_PAGES = 10
+# 窗口内平均字段提取率低于该值即判定选择器失效
+YIELD_THRESHOLD = 0.5
+# 列表页连续多少个页面一张卡片都没匹配到即判定失效
+LISTING_SAMPLE_PAGES = 5
+
+
+class SelectorHealth:
+    """按建筑商跟踪选择器的提取率，网站改版导致选择器失效时尽早中止
+
+    CSS Modules 的类名哈希（如 ModelCard_modelCardContainer__lXz5R）在网站重新部署后会变化，
+    此时每个页面都要等满超时时间，然后产出空行。这里统计最近K个页面中每个字段非空的比例，
+    以及列表页卡片选择器的匹配数，低于阈值时置 tripped，由爬取循环停止该建筑商。
+    """
+
+    def __init__(self, builder, field_selectors, sample_pages=SAMPLE_PAGES, threshold=YIELD_THRESHOLD,
+                 listing_sample_pages=LISTING_SAMPLE_PAGES):
+        self.builder = builder
+        self.field_selectors = field_selectors  # {字段: 提取该字段的选择器}
+        self.threshold = threshold
+        self.rows = deque(maxlen=sample_pages)
+        self.listings = {}  # {选择器: {页面: 最近的匹配数}}，按观察顺序
+        self.listing_sample_pages = listing_sample_pages
+        self.tripped = False
+        self.reason = ""
+        self.failed_selectors = []
+
+    def observe_row(self, row):
+        """记录一个详情页的提取结果"""
+        if self.tripped or not row:
+            return
+        self.rows.append({name: bool(str(row.get(name) or "").strip()) for name in self.field_selectors})
+        if len(self.rows) < self.rows.maxlen:
+            return
+        field_yield = self.field_yield()
+        average = sum(field_yield.values()) / len(field_yield)
+        if average < self.threshold:
+            self._trip(
+                f"最近 {len(self.rows)} 个页面的平均字段提取率 {average:.0%} 低于 {self.threshold:.0%}",
+                [(self.field_selectors[name], name, rate) for name, rate in field_yield.items()
+                 if rate < self.threshold]
+            )
+
+    def observe_listing(self, selector, count, page=None):
+        """记录一个列表页上卡片选择器的匹配数
+
+        page 为页面标识（如URL或市场代码）；同一页面重试或被重新领取时只保留最后一次结果，
+        一个没有房源的页面不会因为重试而占满窗口。
+        """
+        if self.tripped:
+            return
+        counts = self.listings.setdefault(selector, OrderedDict())
+        key = page if page is not None else object()
+        counts.pop(key, None)
+        counts[key] = count
+        while len(counts) > self.listing_sample_pages:
+            counts.popitem(last=False)
+        if len(counts) == self.listing_sample_pages and not any(counts.values()):
+            self._trip(f"连续 {len(counts)} 个列表页没有匹配到任何卡片", [(selector, "卡片", 0.0)])
+
+    def field_yield(self):
+        """窗口内每个字段的非空比例"""
+        if not self.rows:
+            return {}
+        return {name: sum(row[name] for row in self.rows) / len(self.rows) for name in self.field_selectors}
+
+    def _trip(self, reason, failed_selectors):
+        self.tripped = True
+        self.reason = reason
+        self.failed_selectors = failed_selectors
+        print(f"\n⛔ {self.builder} 选择器健康检查未通过，停止爬取: {reason}")
+
+    def report(self):
+        print(f"\n{'=' * 80}")
+        if self.tripped:
+            print(f"⛔ {self.builder} 选择器健康检查未通过，停止爬取: {self.reason}")
+            print("可能已失效的选择器:")
+            for selector, name, rate in self.failed_selectors:
+                print(f"  - {name}: {selector} (提取率 {rate:.0%})")
+        else:
+            print(f"✅ {self.builder} 选择器健康检查通过")
+            for name, rate in self.field_yield().items():
+                print(f"  - {name}: {rate:.0%}")
+        print(f"{'=' * 80}")
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+
+# OneTrust 在用户接受/关闭Cookie弹窗后写入的Cookie，存在即不会再弹出
+CONSENT_COOKIE = "OptanonAlertBoxClosed"
+
+# Playwright storage_state 中的Cookie字段
+_COOKIE_FIELDS = ("name", "value", "domain", "path", "expires", "httpOnly", "secure", "sameSite")
+
+
+class SessionState:
+    """浏览器会话状态(Cookie)的持久化
+
+    文件格式与 Playwright 的 storage_state 相同，Playwright 上下文可直接加载；
+    Selenium(Chrome) 通过 CDP 在打开第一个页面之前预置Cookie。
+    每个浏览器启动时都带上已同意的Cookie，就不必再等待和点击Cookie弹窗。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {"cookies": [], "origins": []}
+        self.saved = False  # 本次运行是否已经写回过
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.state = json.load(f)
+            except Exception as e:
+                print(f"⚠️ 读取会话状态失败，将使用空会话: {str(e)}")
+
+    def cookies(self):
+        """未过期的Cookie（expires 为 -1 的会话Cookie保留）"""
+        now = time.time()
+        return [cookie for cookie in self.state.get("cookies", [])
+                if cookie.get("expires", -1) < 0 or cookie["expires"] > now]
+
+    def has_cookie(self, name):
+        return any(cookie["name"] == name for cookie in self.cookies())
+
+    def _write(self, state):
+        self.state = state
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.saved = True
+
+    # Playwright
+
+    def playwright_options(self):
+        """传给 browser.new_context(**options) 的参数"""
+        if not self.state.get("cookies") and not self.state.get("origins"):
+            return {}
+        return {"storage_state": {"cookies": self.cookies(), "origins": self.state.get("origins", [])}}
+
+    def save_playwright(self, context):
+        try:
+            self._write(context.storage_state())
+        except Exception as e:
+            print(f"⚠️ 保存会话状态失败: {str(e)}")
+
+    # Selenium (Chrome)
+
+    def seed_selenium(self, driver):
+        """在访问任何页面之前预置Cookie；driver.add_cookie 只能设置当前域名，这里改用CDP"""
+        params = []
+        for cookie in self.cookies():
+            param = {key: cookie[key] for key in ("name", "value", "domain", "path", "httpOnly", "secure")
+                     if key in cookie}
+            if cookie.get("sameSite") in ("Strict", "Lax", "None"):
+                param["sameSite"] = cookie["sameSite"]
+            if cookie.get("expires", -1) >= 0:
+                param["expires"] = cookie["expires"]
+            params.append(param)
+        if not params:
+            return
+        try:
+            driver.execute_cdp_cmd("Network.setCookies", {"cookies": params})
+        except Exception as e:
+            print(f"⚠️ 预置会话Cookie失败: {str(e)}")
+
+    def save_selenium(self, driver):
+        try:
+            raw_cookies = driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        except Exception as e:
+            print(f"⚠️ 读取浏览器Cookie失败: {str(e)}")
+            return
+        cookies = []
+        for cookie in raw_cookies:
+            converted = {key: cookie[key] for key in _COOKIE_FIELDS if key in cookie}
+            if cookie.get("session"):
+                converted["expires"] = -1
+            converted.setdefault("sameSite", "Lax")
+            cookies.append(converted)
+        try:
+            self._write({"cookies": cookies, "origins": self.state.get("origins", [])})
+        except Exception as e:
+            print(f"⚠️ 保存会话状态失败: {str(e)}")
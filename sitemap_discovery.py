@@ -0,0 +1,144 @@
+import io
+import os
+import re
+import csv
+import json
+import gzip
+import requests
+import xml.etree.ElementTree as ET
+
+HEADERS = {
+    'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# 站点地图索引最大嵌套深度，防止循环引用
+MAX_INDEX_DEPTH = 3
+
+# 站点地图协议的命名空间；image:loc、xhtml:link 等扩展标签不在其中
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def _open_stream(response):
+    """返回可流式读取的XML字节流，自动识别gzip压缩的站点地图"""
+    response.raw.decode_content = True  # 处理 Content-Encoding: gzip
+    response.raw.auto_close = False  # 读完后由外层关闭，避免包装流读取已关闭的连接
+    stream = io.BufferedReader(response.raw)
+    if stream.peek(2)[:2] == b'\x1f\x8b':
+        # 文件本身是 .xml.gz
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def _sitemap_name(tag):
+    """站点地图命名空间内的标签名，其他命名空间的标签返回 None；兼容未声明命名空间的站点地图"""
+    if tag.startswith('{'):
+        namespace, name = tag[1:].split('}', 1)
+        return name if namespace == SITEMAP_NAMESPACE else None
+    return tag
+
+
+def iter_sitemap_urls(sitemap_url, session=None, depth=0):
+    """流式解析站点地图（含gzip和站点地图索引），逐条返回(loc, lastmod)"""
+    session = session or requests.Session()
+    response = session.get(sitemap_url, headers=HEADERS, timeout=60, stream=True)
+    response.raise_for_status()
+
+    child_sitemaps = []
+    try:
+        stream = _open_stream(response)
+        root = None
+        parents = []  # 当前元素的祖先标签名
+        loc = lastmod = None
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                parents.append(_sitemap_name(elem.tag))
+                continue
+            parents.pop()
+            name = _sitemap_name(elem.tag)
+            if len(parents) == 2 and parents[-1] in ("url", "sitemap"):
+                # 只取 <url>/<sitemap> 的直接子元素，忽略 <image:image><image:loc> 等嵌套内容
+                if name == "loc":
+                    loc = (elem.text or "").strip()
+                elif name == "lastmod":
+                    lastmod = (elem.text or "").strip()
+            elif len(parents) == 1 and name in ("url", "sitemap"):
+                if loc:
+                    if name == "url":
+                        yield loc, lastmod
+                    else:
+                        # 索引中的子站点地图，解析完当前文件后再依次处理
+                        child_sitemaps.append(loc)
+                loc = lastmod = None
+                # 已处理的条目从根节点移除，内存占用不随文件大小增长
+                root.clear()
+    finally:
+        response.close()
+
+    if depth >= MAX_INDEX_DEPTH:
+        if child_sitemaps:
+            print(f"⚠️ 站点地图索引嵌套过深，忽略 {len(child_sitemaps)} 个子站点地图: {sitemap_url}")
+        return
+    for child_url in child_sitemaps:
+        try:
+            yield from iter_sitemap_urls(child_url, session, depth + 1)
+        except Exception as e:
+            print(f"⚠️ 读取子站点地图失败: {child_url} | {str(e)}")
+
+
+def discover_urls(sitemap_urls, patterns):
+    """从站点地图中筛选出符合模式的URL，返回 {url: lastmod}，按首次出现顺序"""
+    compiled = [re.compile(pattern) for pattern in patterns]
+    found = {}
+    session = requests.Session()
+    for sitemap_url in sitemap_urls:
+        print(f"正在读取站点地图: {sitemap_url}")
+        count = 0
+        for loc, lastmod in iter_sitemap_urls(sitemap_url, session):
+            count += 1
+            if loc not in found and any(pattern.search(loc) for pattern in compiled):
+                found[loc] = lastmod
+        print(f"站点地图共 {count} 条URL，匹配 {len(found)} 条")
+    session.close()
+    return found
+
+
+class LastmodStore:
+    """记录每个URL上次成功抓取时的lastmod，用于跳过未变化的页面"""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except Exception as e:
+                print(f"⚠️ 读取lastmod记录失败，将全部重新抓取: {str(e)}")
+
+    def is_unchanged(self, url, lastmod):
+        # 站点地图未提供lastmod时无法判断，按已变化处理
+        return bool(lastmod) and self.data.get(url) == lastmod
+
+    def update(self, url, lastmod):
+        if lastmod:
+            self.data[url] = lastmod
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def load_previous_rows(csv_path, links):
+    """从旧的CSV中流式读取指定链接的最新一行，用于沿用未变化页面的数据"""
+    rows = {}
+    if not csv_path or not links or not os.path.exists(csv_path):
+        return rows
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row.get("link") in links:
+                rows[row["link"]] = row  # 追加写入的文件中后出现的行更新
+    return rows
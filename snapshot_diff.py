@@ -0,0 +1,245 @@
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from operator import itemgetter
+
+# 默认主键：同一建筑商下以房源链接区分，链接缺失时退回home_id
+KEY_FIELDS = ("builder", "link")
+FALLBACK_KEY_FIELD = "home_id"
+
+# 每次爬取都会变化、不参与比较的字段
+IGNORED_FIELDS = ("date_scraped",)
+
+
+def _iter_records(path, date_field=None, date_value=None):
+    """流式读取CSV，逐行返回(起始偏移量, 表头, 字段列表)
+
+    以二进制方式读取并记录每条记录的起始偏移量，变更行可以随后按偏移量回读，
+    因此内存中只需保存主键、哈希和偏移量。
+    """
+    with open(path, 'rb') as f:
+        offsets = deque()
+
+        def lines():
+            pos = 0
+            for line in f:
+                offsets.append(pos)
+                pos += len(line)
+                yield line.decode('utf-8')
+
+        reader = csv.reader(lines())
+        try:
+            header = next(reader)
+        except StopIteration:
+            return
+        if header and header[0].startswith('\ufeff'):
+            header[0] = header[0][1:]
+        consumed = reader.line_num
+        for _ in range(consumed):
+            offsets.popleft()
+
+        date_index = header.index(date_field) if date_field and date_field in header else None
+        for row in reader:
+            # 一条记录可能跨多行（字段内含换行），起始偏移量取其第一行
+            start = offsets.popleft()
+            for _ in range(reader.line_num - consumed - 1):
+                offsets.popleft()
+            consumed = reader.line_num
+            if not row:
+                continue
+            if date_index is not None and row[date_index] != date_value:
+                continue
+            yield start, header, row
+
+
+def _read_row_at(f, header, offset):
+    """按偏移量回读一条记录"""
+    f.seek(offset)
+
+    def lines():
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            yield line.decode('utf-8')
+
+    row = next(csv.reader(lines()))
+    return dict(zip(header, row))
+
+
+class _RowLayout:
+    """根据表头预先计算主键和比较字段的下标，避免逐行查找"""
+
+    def __init__(self, header, key_fields):
+        self.header = header
+        self.width = len(header)
+        key_indexes = [header.index(field) for field in key_fields if field in header]
+        self.fallback_index = header.index(FALLBACK_KEY_FIELD) if FALLBACK_KEY_FIELD in header else None
+        self.compare_fields = [field for field in header if field not in IGNORED_FIELDS]
+        # itemgetter在C层取值，比逐行列表推导快得多
+        getter = itemgetter(*key_indexes)
+        self._key_getter = getter if len(key_indexes) > 1 else (lambda row: (getter(row),))
+        self._compare_getter = itemgetter(*[header.index(field) for field in self.compare_fields])
+
+    def _pad(self, row):
+        # 短行（字段缺失）补齐后再取值
+        return row + [""] * (self.width - len(row))
+
+    def key(self, row):
+        if len(row) < self.width:
+            row = self._pad(row)
+        key = self._key_getter(row)
+        if not key[-1] and self.fallback_index is not None:
+            key = key[:-1] + (row[self.fallback_index],)
+        return key
+
+    def digest(self, row):
+        if len(row) < self.width:
+            row = self._pad(row)
+        return hash(self._compare_getter(row))
+
+
+def previous_date(path, before, date_field="date_scraped"):
+    """在追加写入的CSV中查找早于before的最近一次爬取日期"""
+    latest = None
+    index = None
+    for _, header, row in _iter_records(path):
+        if index is None:
+            index = header.index(date_field)
+        value = row[index] if index < len(row) else ""
+        if value and value < before and (latest is None or value > latest):
+            latest = value
+    return latest
+
+
+def diff_snapshots(old_path, new_path, output_path, key_fields=KEY_FIELDS,
+                   old_date=None, new_date=None, date_field="date_scraped", skip_removed=None):
+    """对两个快照做哈希连接，输出新增/下架/变更的增量文件(JSON Lines)
+
+    旧快照只在内存中保留 主键 -> (行哈希, 偏移量)，新快照完全流式处理；
+    只有哈希不同的行才回读旧记录比较具体字段。
+    old_date/new_date 用于在同一个追加写入的文件中按爬取日期划分快照。
+    skip_removed(key) 为真的旧房源未出现在新快照中时不算下架（如本次被推迟、没有爬取的市场）。
+    """
+    start_time = time.time()
+
+    # 第一遍：为旧快照建立索引
+    old_index = {}
+    old_header = None
+    old_layout = None
+    for offset, header, row in _iter_records(old_path, date_field if old_date else None, old_date):
+        if old_layout is None:
+            old_header = header
+            old_layout = _RowLayout(header, key_fields)
+        old_index[old_layout.key(row)] = (old_layout.digest(row), offset)
+
+    counts = {"added": 0, "removed": 0, "changed": 0, "unchanged": 0, "not_crawled": 0,
+              "price_down": 0, "price_up": 0, "status_changed": 0}
+
+    with open(output_path, 'w', encoding='utf-8') as out, open(old_path, 'rb') as old_file:
+        def emit(record):
+            out.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            out.write("\n")
+
+        # 第二遍：流式扫描新快照
+        new_layout = None
+        same_header = False
+        seen = set()
+        for _, header, row in _iter_records(new_path, date_field if new_date else None, new_date):
+            if new_layout is None:
+                new_layout = _RowLayout(header, key_fields)
+                same_header = header == old_header
+            key = new_layout.key(row)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            entry = old_index.get(key)
+            if entry is None:
+                counts["added"] += 1
+                emit({"op": "added", "key": key, "row": dict(zip(header, row))})
+                continue
+
+            if same_header and entry[0] == new_layout.digest(row):
+                counts["unchanged"] += 1
+                continue
+
+            old_row = _read_row_at(old_file, old_header, entry[1])
+            new_row = dict(zip(header, row))
+            changes = {field: [old_row.get(field, ""), new_row.get(field, "")]
+                       for field in new_layout.compare_fields
+                       if old_row.get(field, "") != new_row.get(field, "")}
+            if not changes:
+                counts["unchanged"] += 1
+                continue
+
+            counts["changed"] += 1
+            if "price" in changes:
+                old_price, new_price = _to_number(changes["price"][0]), _to_number(changes["price"][1])
+                if old_price is not None and new_price is not None:
+                    if new_price < old_price:
+                        counts["price_down"] += 1
+                    elif new_price > old_price:
+                        counts["price_up"] += 1
+            if "status" in changes:
+                counts["status_changed"] += 1
+            emit({"op": "changed", "key": key, "changes": changes})
+
+        # 旧快照中未出现在新快照里的即为下架房源
+        for key, (_, offset) in old_index.items():
+            if key not in seen:
+                if skip_removed and skip_removed(key):
+                    counts["not_crawled"] += 1
+                    continue
+                counts["removed"] += 1
+                emit({"op": "removed", "key": key, "row": _read_row_at(old_file, old_header, offset)})
+
+    counts["elapsed"] = round(time.time() - start_time, 2)
+    return counts
+
+
+def _to_number(value):
+    try:
+        return float(value.replace('$', '').replace(',', ''))
+    except (AttributeError, ValueError):
+        return None
+
+
+def print_diff_summary(counts, output_path):
+    print(f"\n{'=' * 80}")
+    print(f"快照对比完成 (耗时 {counts['elapsed']}秒)")
+    print(f"新增: {counts['added']} | 下架: {counts['removed']} | 变更: {counts['changed']} | "
+          f"未变: {counts['unchanged']}")
+    if counts.get("not_crawled"):
+        print(f"本次未爬取(不计为下架): {counts['not_crawled']}")
+    print(f"降价: {counts['price_down']} | 涨价: {counts['price_up']} | 状态变化: {counts['status_changed']}")
+    print(f"增量文件: {output_path}")
+    print(f"{'=' * 80}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比两个房源快照，生成变更增量文件")
+    parser.add_argument("old", help="旧快照CSV")
+    parser.add_argument("new", nargs="?", help="新快照CSV，省略时与旧快照为同一文件(配合日期参数)")
+    parser.add_argument("-o", "--output", default="changes.jsonl", help="增量输出文件(JSON Lines)")
+    parser.add_argument("--old-date", help="只取旧快照中该日期(date_scraped)的行")
+    parser.add_argument("--new-date", help="只取新快照中该日期(date_scraped)的行")
+    parser.add_argument("--key", default=",".join(KEY_FIELDS), help="主键字段，逗号分隔")
+    args = parser.parse_args()
+
+    new_path = args.new or args.old
+    if not os.path.exists(args.old) or not os.path.exists(new_path):
+        print("❌ 快照文件不存在")
+        sys.exit(1)
+
+    counts = diff_snapshots(args.old, new_path, args.output, key_fields=tuple(args.key.split(",")),
+                            old_date=args.old_date, new_date=args.new_date)
+    print_diff_summary(counts, args.output)
+
+
+if __name__ == "__main__":
+    main()
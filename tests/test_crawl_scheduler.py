@@ -0,0 +1,24 @@
+from crawl_scheduler import CrawlScheduler, link_digest
+
+
+def test_partially_deferred_market_carries_forward_only_uncrawled_links(tmp_path):
+    history = tmp_path / "history.json"
+    previous = CrawlScheduler(str(history))
+    previous.record("texas", ["https://x/a", "https://x/b", "https://x/c"], 120)
+
+    scheduler = CrawlScheduler(str(history), time_budget=60)
+    scheduler.defer("texas", "时间预算不足", parts=["https://x/community-2"], crawled_links=["https://x/a"])
+
+    assert scheduler.is_deferred("texas")
+    assert not scheduler.is_deferred("ohio")
+    assert scheduler.deferred_links() == {link_digest("https://x/b"), link_digest("https://x/c")}
+    assert scheduler.deferred_parts["texas"] == ["https://x/community-2"]
+
+
+def test_has_time_for(tmp_path):
+    scheduler = CrawlScheduler(str(tmp_path / "history.json"), time_budget=60)
+    assert scheduler.has_time_for(10)
+    assert not scheduler.has_time_for(120)
+
+    unlimited = CrawlScheduler(str(tmp_path / "history.json"))
+    assert unlimited.has_time_for(10 ** 9)
@@ -0,0 +1,49 @@
+from home_record import FIELDNAMES, normalize_batch, normalize_row, normalize_rows
+
+ROWS = [
+    {"price": "From $400,000 - $450,000", "sqft": "1,800 - 2,100 sq ft", "bedrooms": "3 - 4",
+     "full_bathrooms": "2.5", "zip": "78701-1234", "garage": "2 Car", "link": " https://example.com/a "},
+    {"price": "$499,990", "full_bathrooms": "2.5", "half_bathrooms": "2", "zip": "Austin, TX 78702"},
+    {"full_bathrooms": "3", "half_bathrooms": "", "floors": "1.5", "zip": "n/a"},
+]
+
+
+def test_ranges_take_the_lower_bound():
+    record = normalize_batch(ROWS)[0]
+
+    assert record.price == 400000
+    assert record.sqft == 1800
+    assert record.bedrooms == 3
+    assert record.garage == 2.0
+
+
+def test_decimal_baths_split_into_full_and_half():
+    first, second, third = normalize_batch(ROWS)
+
+    assert (first.full_bathrooms, first.half_bathrooms) == (2, 1)
+    # 单独给出的半卫数不被覆盖
+    assert (second.full_bathrooms, second.half_bathrooms) == (2, 2)
+    assert (third.full_bathrooms, third.half_bathrooms) == (3, None)
+
+
+def test_zip_keeps_five_digits():
+    assert [record.zip for record in normalize_batch(ROWS)] == ["78701", "78702", None]
+
+
+def test_row_formatting():
+    row = normalize_rows(ROWS)[0]
+
+    assert list(row) == FIELDNAMES
+    assert row["price"] == "400000"
+    assert row["garage"] == "2"
+    assert row["link"] == "https://example.com/a"
+    assert row["status"] == ""
+    assert normalize_rows(ROWS)[2]["floors"] == "1.5"
+
+
+def test_normalize_row_matches_batch():
+    assert [normalize_row(row) for row in ROWS] == normalize_rows(ROWS)
+
+
+def test_empty_batch():
+    assert normalize_batch([]) == []
@@ -0,0 +1,89 @@
+import time
+
+from job_queue import JobQueue, PENDING, LEASED, DONE, FAILED
+
+
+def make_queue(tmp_path, **kwargs):
+    return JobQueue(str(tmp_path / "jobs.sqlite"), **kwargs)
+
+
+def expire_leases(queue):
+    # 把所有租约改为已过期，模拟持有任务的进程崩溃
+    queue._conn().execute("UPDATE jobs SET lease_expires = ? WHERE status = ?", (time.time() - 1, LEASED))
+
+
+def test_enqueue_is_idempotent(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.enqueue("market", "a", {"url": "x"})
+    assert not queue.enqueue("market", "a", {"url": "y"})
+    assert queue.enqueue_many("market", [("a", None), ("b", None), ("c", None)]) == 2
+    assert queue.counts()[PENDING] == 3
+
+
+def test_claim_leases_job_until_completed(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("market", "a", {"url": "x"})
+
+    job = queue.claim("w1")
+    assert job["key"] == "a" and job["payload"] == {"url": "x"} and job["attempts"] == 1
+    # 租约有效期内其他进程领取不到
+    assert queue.claim("w2") is None
+
+    assert not queue.complete(job["id"], "w2")
+    assert queue.complete(job["id"], "w1")
+    assert queue.counts()[DONE] == 1
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("market", "a")
+    first = queue.claim("w1")
+
+    expire_leases(queue)
+    second = queue.claim("w2")
+    assert second["id"] == first["id"]
+    assert second["attempts"] == 2
+    # 原进程的租约已丢失
+    assert not queue.heartbeat(first["id"], "w1")
+    assert queue.heartbeat(second["id"], "w2")
+
+
+def test_expired_lease_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=3)
+    queue.enqueue("market", "crash")
+
+    for attempt in range(1, 4):
+        job = queue.claim("w1")
+        assert job["attempts"] == attempt
+        expire_leases(queue)
+
+    # 第三次租约也过期后不再领取，直接标记为失败
+    assert queue.claim("w1") is None
+    counts = queue.counts()
+    assert counts[FAILED] == 1 and counts[LEASED] == 0 and counts[PENDING] == 0
+
+
+def test_fail_requeues_until_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    queue.enqueue("market", "a")
+
+    job = queue.claim("w1")
+    assert queue.fail(job["id"], "w1", "timeout")
+    assert queue.counts()[PENDING] == 1
+
+    job = queue.claim("w1")
+    assert queue.fail(job["id"], "w1", "timeout")
+    assert queue.counts()[FAILED] == 1
+    assert queue.claim("w1") is None
+
+
+def test_claim_respects_priority_and_kinds(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("market", "low", priority=0)
+    queue.enqueue("market", "high", priority=5)
+    queue.enqueue("home", "h1", priority=10)
+
+    assert queue.claim("w1", kinds=["market"])["key"] == "high"
+    assert queue.claim("w1", kinds=["market"])["key"] == "low"
+    assert queue.claim("w1", kinds=["market"]) is None
+    assert queue.claim("w1")["key"] == "h1"
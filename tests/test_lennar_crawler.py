@@ -0,0 +1,92 @@
+import csv
+import json
+import re
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("selenium")
+pytest.importorskip("bs4")
+
+import lennar_crawler
+from home_record import FIELDNAMES
+from selector_health import SelectorHealth
+
+
+def home(date, link, price):
+    return {"date_scraped": date, "builder": "Lennar", "link": link, "price": price, "status": "Available"}
+
+
+def write_run(csv_path, run_date, rows, monkeypatch):
+    monkeypatch.setattr(lennar_crawler, "run_date", run_date)
+    exists = csv_path.exists()
+    with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        if not exists:
+            writer.writeheader()
+        for row in rows:
+            lennar_crawler.write_property(writer, f, row)
+
+
+def test_run_spanning_midnight_is_one_snapshot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    csv_path = tmp_path / "lennar_all_homes.csv"
+    # 两次运行都跨过午夜：解析时的日期不同，写入时统一为运行开始的日期
+    write_run(csv_path, "2024-09-30", [
+        home("2024-09-30", "https://l/1", "100"),
+        home("2024-10-01", "https://l/2", "200"),
+    ], monkeypatch)
+    write_run(csv_path, "2024-10-01", [
+        home("2024-10-01", "https://l/1", "100"),
+        home("2024-10-02", "https://l/2", "190"),
+        home("2024-10-02", "https://l/3", "300"),
+    ], monkeypatch)
+
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        assert [row["date_scraped"] for row in csv.DictReader(f)] == ["2024-09-30"] * 2 + ["2024-10-01"] * 3
+
+    lennar_crawler.report_changes(str(csv_path), "2024-10-01")
+    with open(tmp_path / "lennar_changes_2024-10-01.jsonl", encoding='utf-8') as f:
+        ops = sorted((record["op"], record["key"][-1]) for record in map(json.loads, f))
+    assert ops == [("added", "https://l/3"), ("changed", "https://l/2")]
+
+
+class FakeDriver:
+    def quit(self):
+        pass
+
+
+def test_empty_market_retries_count_once(monkeypatch):
+    health = SelectorHealth("Lennar", lennar_crawler.FIELD_SELECTORS)
+    monkeypatch.setattr(lennar_crawler, "selector_health", health)
+    monkeypatch.setattr(lennar_crawler, "dead_letters", None)
+    monkeypatch.setattr(lennar_crawler, "setup_driver", FakeDriver)
+    monkeypatch.setattr(lennar_crawler, "get_links_for_market", lambda driver, state, market: [])
+    monkeypatch.setattr(lennar_crawler.time, "sleep", lambda seconds: None)
+
+    # 每个空市场重试3次，只计为一个列表页；两个空市场不会触发停止
+    assert lennar_crawler.fetch_market_links("TX", "AUS") == []
+    assert lennar_crawler.fetch_market_links("TX", "DAL") == []
+    assert not health.tripped
+    assert len(health.listings[lennar_crawler.HOMESITE_CARD_SELECTOR]) == 2
+
+
+def test_market_that_never_loads_is_not_observed(monkeypatch):
+    health = SelectorHealth("Lennar", lennar_crawler.FIELD_SELECTORS)
+    monkeypatch.setattr(lennar_crawler, "selector_health", health)
+    monkeypatch.setattr(lennar_crawler, "dead_letters", None)
+    monkeypatch.setattr(lennar_crawler, "setup_driver", FakeDriver)
+    monkeypatch.setattr(lennar_crawler, "get_links_for_market", lambda driver, state, market: None)
+    monkeypatch.setattr(lennar_crawler.time, "sleep", lambda seconds: None)
+
+    assert lennar_crawler.fetch_market_links("TX", "AUS") == []
+    assert not health.listings
+
+
+def test_sitemap_pattern_rejects_deeper_pages():
+    pattern = re.compile(lennar_crawler.SITEMAP_PROPERTY_PATTERNS[0])
+    home = "https://www.lennar.com/new-homes/texas/dallas/frisco/community/plan"
+
+    assert pattern.search(home)
+    assert pattern.search(home + "/")
+    assert not pattern.search(home + "/gallery")
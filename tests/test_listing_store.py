@@ -0,0 +1,100 @@
+import csv
+import sqlite3
+
+from listing_store import ListingStore, import_csv
+
+
+def row(date, price, status="Available", link="https://a/1", **fields):
+    return dict({"date_scraped": date, "builder": "Lennar", "link": link, "price": price, "status": status},
+                **fields)
+
+
+def listing(store, key="https://a/1"):
+    return store.conn.execute(
+        "SELECT price, status, first_seen, last_seen FROM listings WHERE builder = ? AND listing_key = ?",
+        ("Lennar", key)
+    ).fetchone()
+
+
+def test_history_only_records_changes(tmp_path):
+    store = ListingStore(str(tmp_path / "store.sqlite"))
+    for date, price in [("2024-10-01", "$500,000"), ("2024-10-02", "$500,000"), ("2024-10-03", "$490,000")]:
+        store.add(row(date, price))
+        store.flush()
+
+    assert store.price_history("Lennar", "https://a/1") == [
+        ("2024-10-01", 500000, "Available"), ("2024-10-03", 490000, "Available")]
+    assert listing(store) == (490000, "Available", "2024-10-01", "2024-10-03")
+    store.close()
+
+
+def test_multiple_dates_in_one_batch(tmp_path):
+    store = ListingStore(str(tmp_path / "store.sqlite"))
+    # 同一批次中日期乱序、同一天重复：按日期依次应用，同一天只保留最后一行
+    store.add(row("2024-10-03", "90"))
+    store.add(row("2024-10-01", "100"))
+    store.add(row("2024-10-02", "95"))
+    store.add(row("2024-10-02", "100"))
+    store.flush()
+
+    assert store.price_history("Lennar", "https://a/1") == [
+        ("2024-10-01", 100, "Available"), ("2024-10-03", 90, "Available")]
+    assert listing(store) == (90, "Available", "2024-10-01", "2024-10-03")
+    store.close()
+
+
+def test_older_import_does_not_overwrite_newer(tmp_path):
+    store = ListingStore(str(tmp_path / "store.sqlite"))
+    store.add(row("2024-10-05", "300", status="Sold"))
+    store.flush()
+    store.add(row("2024-10-01", "350"))
+    store.flush()
+
+    price, status, _, last_seen = listing(store)
+    assert (price, status, last_seen) == (300, "Sold", "2024-10-05")
+    store.close()
+
+
+def test_home_id_key_and_invalid_rows(tmp_path):
+    store = ListingStore(str(tmp_path / "store.sqlite"))
+    store.add(row("2024-10-01", "100", link="", home_id="H1"))
+    store.add(row("2024-10-01", "100", link="", home_id=""))  # 没有主键
+    store.add(row("", "100", link="https://a/2"))  # 没有爬取日期
+    store.flush()
+
+    assert store.written == 1
+    assert listing(store, "H1")[0] == 100
+    store.close()
+
+
+def test_locked_database_keeps_running(tmp_path, capsys):
+    path = str(tmp_path / "store.sqlite")
+    store = ListingStore(path)
+    store.conn.execute("PRAGMA busy_timeout=0")
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        store.add(row("2024-10-01", "100"))
+        store.flush()
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    assert store.written == 0
+    assert not store.conn.in_transaction
+    assert "未写入" in capsys.readouterr().out
+    store.close()
+
+
+def test_import_csv(tmp_path):
+    csv_path = tmp_path / "lennar.csv"
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=["date_scraped", "builder", "link", "price", "status"])
+        writer.writeheader()
+        writer.writerow(row("2024-10-01", "100"))
+        writer.writerow(row("2024-10-02", "120"))
+
+    store = ListingStore(str(tmp_path / "store.sqlite"))
+    assert import_csv(store, str(csv_path)) == 2
+    assert [price for _, price, _ in store.price_history("Lennar", "https://a/1")] == [100, 120]
+    store.close()
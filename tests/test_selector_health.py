@@ -0,0 +1,40 @@
+from selector_health import SelectorHealth
+
+FIELDS = {"price": "span.price", "sqft": "div.sqft"}
+
+
+def test_empty_listing_pages_trip_after_window():
+    health = SelectorHealth("Test", FIELDS, listing_sample_pages=3)
+    health.observe_listing("a.card", 0, "page-1")
+    health.observe_listing("a.card", 0, "page-2")
+    assert not health.tripped
+    health.observe_listing("a.card", 0, "page-3")
+    assert health.tripped
+
+
+def test_retrying_the_same_page_counts_once():
+    health = SelectorHealth("Test", FIELDS, listing_sample_pages=3)
+    for _ in range(3):
+        health.observe_listing("a.card", 0, "market-1")
+    health.observe_listing("a.card", 0, "market-2")
+    assert not health.tripped
+    assert list(health.listings["a.card"]) == ["market-1", "market-2"]
+
+
+def test_cards_found_reset_the_window():
+    health = SelectorHealth("Test", FIELDS, listing_sample_pages=3)
+    health.observe_listing("a.card", 0)
+    health.observe_listing("a.card", 12)
+    health.observe_listing("a.card", 0)
+    health.observe_listing("a.card", 0)
+    assert not health.tripped
+
+
+def test_low_field_yield_trips():
+    health = SelectorHealth("Test", FIELDS, sample_pages=4)
+    for _ in range(4):
+        health.observe_row({"price": "100", "sqft": ""})
+    assert not health.tripped  # 平均提取率 50%，不低于阈值
+    health.observe_row({"price": "", "sqft": ""})
+    assert health.tripped
+    assert [name for _, name, _ in health.failed_selectors] == ["sqft"]
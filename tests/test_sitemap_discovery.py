@@ -0,0 +1,87 @@
+import gzip
+import io
+
+import pytest
+
+pytest.importorskip("requests")
+
+from sitemap_discovery import iter_sitemap_urls
+
+INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://example.com/homes.xml.gz</loc><lastmod>2024-01-01</lastmod></sitemap>
+  <sitemap><loc>https://example.com/pages.xml</loc></sitemap>
+</sitemapindex>"""
+
+HOMES = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">
+  <url>
+    <loc>https://example.com/homes/a</loc>
+    <lastmod>2024-05-01</lastmod>
+    <image:image><image:loc>https://example.com/img/a.jpg</image:loc></image:image>
+  </url>
+  <url>
+    <image:image><image:loc>https://example.com/img/b.jpg</image:loc></image:image>
+    <loc>https://example.com/homes/b</loc>
+  </url>
+</urlset>"""
+
+PAGES = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://example.com/about</loc><lastmod>2023-12-31</lastmod></url>
+</urlset>"""
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.raw = io.BytesIO(body)
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url)
+        return FakeResponse(self.pages[url])
+
+
+def test_index_with_gzip_child_and_image_tags():
+    session = FakeSession({
+        "https://example.com/sitemap.xml": INDEX,
+        "https://example.com/homes.xml.gz": gzip.compress(HOMES),
+        "https://example.com/pages.xml": PAGES,
+    })
+
+    urls = list(iter_sitemap_urls("https://example.com/sitemap.xml", session))
+
+    # image:loc 不能覆盖或冒充页面的 loc
+    assert urls == [
+        ("https://example.com/homes/a", "2024-05-01"),
+        ("https://example.com/homes/b", None),
+        ("https://example.com/about", "2023-12-31"),
+    ]
+    assert session.requested == [
+        "https://example.com/sitemap.xml",
+        "https://example.com/homes.xml.gz",
+        "https://example.com/pages.xml",
+    ]
+
+
+def test_unreadable_child_sitemap_is_skipped():
+    session = FakeSession({
+        "https://example.com/sitemap.xml": INDEX,
+        "https://example.com/pages.xml": PAGES,
+    })
+
+    urls = list(iter_sitemap_urls("https://example.com/sitemap.xml", session))
+
+    assert urls == [("https://example.com/about", "2023-12-31")]
@@ -0,0 +1,110 @@
+import csv
+import json
+
+from snapshot_diff import diff_snapshots, previous_date
+
+HEADER = ["date_scraped", "builder", "home_id", "price", "status", "link", "address"]
+
+
+def write_csv(path, rows, header=HEADER):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def run_diff(tmp_path, old, new, **kwargs):
+    output = tmp_path / "changes.jsonl"
+    counts = diff_snapshots(old, new, str(output), **kwargs)
+    with open(output, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    return counts, {record["op"]: record for record in records}, records
+
+
+def test_added_removed_changed(tmp_path):
+    old = write_csv(tmp_path / "old.csv", [
+        ["2024-10-01", "Lennar", "1", "500000", "Available", "https://a/1", "1 Main St"],
+        ["2024-10-01", "Lennar", "2", "400000", "Available", "https://a/2", "2 Main St"],
+        ["2024-10-01", "Lennar", "3", "300000", "Available", "https://a/3", "3 Main St"],
+    ])
+    new = write_csv(tmp_path / "new.csv", [
+        # 只有爬取日期变化，不算变更
+        ["2024-10-02", "Lennar", "1", "500000", "Available", "https://a/1", "1 Main St"],
+        ["2024-10-02", "Lennar", "2", "$390,000", "Sold", "https://a/2", "2 Main St"],
+        ["2024-10-02", "Lennar", "4", "600000", "Available", "https://a/4", "4 Main St"],
+    ])
+
+    counts, by_op, _ = run_diff(tmp_path, old, new)
+    assert (counts["added"], counts["removed"], counts["changed"], counts["unchanged"]) == (1, 1, 1, 1)
+    assert counts["price_down"] == 1 and counts["status_changed"] == 1
+    assert by_op["added"]["key"] == ["Lennar", "https://a/4"]
+    assert by_op["removed"]["row"]["address"] == "3 Main St"
+    assert by_op["changed"]["changes"] == {"price": ["400000", "$390,000"], "status": ["Available", "Sold"]}
+
+
+def test_missing_link_falls_back_to_home_id(tmp_path):
+    old = write_csv(tmp_path / "old.csv", [["2024-10-01", "Toll", "H9", "500000", "Available", "", "9 Elm"]])
+    new = write_csv(tmp_path / "new.csv", [["2024-10-02", "Toll", "H9", "510000", "Available", "", "9 Elm"]])
+
+    counts, by_op, _ = run_diff(tmp_path, old, new)
+    assert counts["changed"] == 1 and counts["added"] == 0 and counts["removed"] == 0
+    assert by_op["changed"]["key"] == ["Toll", "H9"]
+
+
+def test_offsets_read_back_multiline_records(tmp_path):
+    # 字段内含换行和非ASCII字符时，按字节偏移量回读的仍是同一条记录
+    old = write_csv(tmp_path / "old.csv", [
+        ["2024-10-01", "Lennar", "1", "500000", "Available", "https://a/1", "1 Main St\nUnit 5 – Ñ"],
+        ["2024-10-01", "Lennar", "2", "400000", "Available", "https://a/2", "2 Main St\r\nSuite B"],
+        ["2024-10-01", "Lennar", "3", "300000", "Available", "https://a/3", "3 Main St"],
+    ])
+    new = write_csv(tmp_path / "new.csv", [
+        ["2024-10-02", "Lennar", "2", "450000", "Available", "https://a/2", "2 Main St\r\nSuite B"],
+        ["2024-10-02", "Lennar", "3", "300000", "Available", "https://a/3", "3 Main St"],
+    ])
+
+    counts, by_op, _ = run_diff(tmp_path, old, new)
+    assert by_op["removed"]["row"]["address"] == "1 Main St\nUnit 5 – Ñ"
+    assert by_op["removed"]["row"]["link"] == "https://a/1"
+    assert by_op["changed"]["changes"] == {"price": ["400000", "450000"]}
+    assert counts["unchanged"] == 1
+
+
+def test_dates_split_one_appended_file(tmp_path):
+    path = write_csv(tmp_path / "all.csv", [
+        ["2024-10-01", "Lennar", "1", "500000", "Available", "https://a/1", ""],
+        ["2024-10-01", "Lennar", "2", "400000", "Available", "https://a/2", ""],
+        ["2024-10-02", "Lennar", "1", "490000", "Available", "https://a/1", ""],
+        ["2024-10-03", "Lennar", "3", "300000", "Available", "https://a/3", ""],
+    ])
+
+    assert previous_date(path, "2024-10-03") == "2024-10-02"
+    assert previous_date(path, "2024-10-01") is None
+
+    counts, by_op, _ = run_diff(tmp_path, path, path, old_date="2024-10-01", new_date="2024-10-02")
+    assert (counts["added"], counts["removed"], counts["changed"]) == (0, 1, 1)
+    assert by_op["removed"]["key"] == ["Lennar", "https://a/2"]
+
+
+def test_skip_removed_counts_not_crawled(tmp_path):
+    old = write_csv(tmp_path / "old.csv", [
+        ["2024-10-01", "Lennar", "1", "500000", "Available", "https://a/1", ""],
+        ["2024-10-01", "Lennar", "2", "400000", "Available", "https://deferred/2", ""],
+    ])
+    new = write_csv(tmp_path / "new.csv", [])
+
+    counts, _, records = run_diff(tmp_path, old, new, skip_removed=lambda key: "deferred" in key[-1])
+    assert counts["removed"] == 1 and counts["not_crawled"] == 1
+    assert [record["key"] for record in records] == [["Lennar", "https://a/1"]]
+
+
+def test_duplicate_new_rows_counted_once(tmp_path):
+    old = write_csv(tmp_path / "old.csv", [["2024-10-01", "Lennar", "1", "500000", "Available", "https://a/1", ""]])
+    new = write_csv(tmp_path / "new.csv", [
+        ["2024-10-02", "Lennar", "1", "500000", "Available", "https://a/1", ""],
+        ["2024-10-02", "Lennar", "1", "480000", "Available", "https://a/1", ""],
+    ])
+
+    counts, _, _ = run_diff(tmp_path, old, new)
+    assert counts["unchanged"] == 1 and counts["changed"] == 0